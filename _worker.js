@@ -1,9 +1,146 @@
-export default {
-  async fetch(request, env) {
-    const url = new URL(request.url);
-    url.protocol = "http:";
-    url.host = "127.0.0.1:8080";
-    
-    return fetch(url, request);
+// Edge proxy in front of the gunicorn origin.
+//
+// GET results pages (/?location=...) and /api/forecast responses are cached
+// at the edge under a normalized key, following the origin's Cache-Control
+// and ETag. Concurrent misses for the same key share one origin request, and
+// a longer-lived stale copy is served when the origin fails. The origin tags
+// responses with Cache-Tag per location so forecast refreshes purge them.
+
+const ORIGIN = "127.0.0.1:8080";
+
+// Must match DEFAULT_SUNBATHING_CRITERIA and canonical_query() in app.py
+const CRITERIA_DEFAULTS = [
+  ["min_temp", "72"],
+  ["max_temp", "85"],
+  ["max_wind", "10"],
+  ["required_condition", "clouds"],
+];
+
+// How long the stale fallback copy is kept after it was stored (seconds)
+const STALE_TTL = 24 * 3600;
+
+// In-flight origin requests per cache key, for collapsing concurrent misses
+const inflight = new Map();
+
+function originUrl(url) {
+  const origin = new URL(url);
+  origin.protocol = "http:";
+  origin.host = ORIGIN;
+  return origin;
+}
+
+// Return the normalized cache key URL, or null if the request isn't cacheable
+function cacheKey(request) {
+  if (request.method !== "GET" && request.method !== "HEAD") return null;
+  const url = new URL(request.url);
+  const isResults = url.pathname === "/" && url.searchParams.has("location");
+  if (!isResults && url.pathname !== "/api/forecast") return null;
+
+  const params = new URLSearchParams();
+  for (const location of url.searchParams.getAll("location")) {
+    params.append("location", location);
+  }
+  for (const [name, fallback] of CRITERIA_DEFAULTS) {
+    params.set(name, url.searchParams.get(name) || fallback);
+  }
+  if (isResults && url.searchParams.get("compact") === "1") {
+    params.set("compact", "1");
+  }
+  const key = new URL(url.origin + url.pathname);
+  key.search = params.toString();
+  return key.toString();
+}
+
+function staleKey(key) {
+  const url = new URL(key);
+  url.searchParams.set("__stale", "1");
+  return url.toString();
+}
+
+function withHeader(response, name, value) {
+  const copy = new Response(response.body, response);
+  copy.headers.set(name, value);
+  return copy;
+}
+
+function notModified(request, response) {
+  const etag = response.headers.get("ETag");
+  const ifNoneMatch = request.headers.get("If-None-Match");
+  if (!etag || !ifNoneMatch) return null;
+  const matches = ifNoneMatch.split(",").map((tag) => tag.trim());
+  if (!matches.includes(etag) && !matches.includes("*")) return null;
+  const headers = new Headers();
+  for (const name of ["ETag", "Cache-Control", "Vary"]) {
+    if (response.headers.has(name)) headers.set(name, response.headers.get(name));
+  }
+  return new Response(null, { status: 304, headers });
+}
+
+// Fetch from the origin and store cacheable responses under the key
+async function fetchAndCache(key, ctx) {
+  const cache = caches.default;
+  const stale = await cache.match(staleKey(key));
+  const headers = { "Accept-Encoding": "gzip, br" };
+  if (stale && stale.headers.get("ETag")) {
+    // Revalidate the stale copy instead of transferring the page again
+    headers["If-None-Match"] = stale.headers.get("ETag");
   }
+
+  let response;
+  try {
+    response = await fetch(originUrl(key), { headers, redirect: "manual" });
+  } catch (err) {
+    if (stale) return withHeader(stale, "X-Edge-Cache", "STALE");
+    throw err;
+  }
+
+  if (response.status === 304 && stale) {
+    // Same content; refresh its lifetime with the origin's new headers
+    const refreshed = new Response(stale.body, stale);
+    for (const name of ["Cache-Control", "ETag", "Cache-Tag"]) {
+      if (response.headers.has(name)) refreshed.headers.set(name, response.headers.get(name));
+    }
+    response = refreshed;
+  } else if (response.status >= 500 && stale) {
+    return withHeader(stale, "X-Edge-Cache", "STALE");
+  }
+
+  const cacheControl = response.headers.get("Cache-Control") || "";
+  const maxAge = /max-age=(\d+)/.exec(cacheControl);
+  if (response.status === 200 && /public/.test(cacheControl) && maxAge && Number(maxAge[1]) > 0) {
+    const fallback = new Response(response.clone().body, response);
+    fallback.headers.set("Cache-Control", `public, max-age=${STALE_TTL}`);
+    ctx.waitUntil(Promise.all([
+      cache.put(key, response.clone()),
+      cache.put(staleKey(key), fallback),
+    ]));
+  }
+  return withHeader(response, "X-Edge-Cache", "MISS");
+}
+
+export default {
+  async fetch(request, env, ctx) {
+    const key = cacheKey(request);
+    if (!key) {
+      return fetch(originUrl(request.url), request);
+    }
+
+    // Send non-canonical URLs to the origin, which redirects to the canonical one
+    if (key !== new URL(request.url).toString()) {
+      return fetch(originUrl(request.url), request);
+    }
+
+    const cached = await caches.default.match(key);
+    if (cached) {
+      return notModified(request, cached) || withHeader(cached, "X-Edge-Cache", "HIT");
+    }
+
+    let pending = inflight.get(key);
+    if (!pending) {
+      pending = fetchAndCache(key, ctx).finally(() => inflight.delete(key));
+      inflight.set(key, pending);
+    }
+    const response = (await pending).clone();
+    return notModified(request, response) || response;
+  },
 };
@@ -1,19 +1,115 @@
 #!/usr/bin/env python3
 
 import datetime
+import functools
+import gzip
+import hashlib
+import json
+import math
+import re
 import requests
 import os
+import atexit
+import bisect
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from cache import BoundedCache, stats as cache_stats
 from dotenv import load_dotenv
-from flask import Flask, request, render_template_string
+from flask import Flask, g, jsonify, redirect, request, render_template
+from jinja2 import DictLoader
 from markupsafe import Markup
+from typing import List, Optional, Union
+from urllib.parse import urlencode
+
+# fcntl shares the NWS rate limiter across gunicorn workers; without it
+# (Windows) the limiter only covers the current process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
+# Static files are served by static_asset() with precompressed bodies
+app = Flask(__name__, static_folder=None)
 
 USER_AGENT = f"SunbathingChecker/1.0 ({os.getenv('USER_EMAIL')})"
 
+# Point at a local nws_emulator.py instance for offline or load testing
+NWS_API_BASE = os.getenv("NWS_API_BASE", "https://api.weather.gov").rstrip("/")
+
+# Active alerts are fetched with one bulk query per area (state) and cached by
+# zone for this many seconds.
+ALERT_CACHE_TTL = 120
+
+# Raw gridpoint layers are refreshed by NWS roughly hourly
+GRIDPOINT_CACHE_TTL = 1800
+
+# Forecasts are cached for the max-age NWS sends, or this many seconds
+FORECAST_CACHE_TTL = 600
+
+# Cloudflare credentials for purging edge-cached pages by Cache-Tag when a
+# location's forecast changes; purging is skipped when unset
+CF_ZONE_ID = os.getenv("CF_ZONE_ID")
+CF_API_TOKEN = os.getenv("CF_API_TOKEN")
+
+# Request header holding the client's address when behind a proxy that sets
+# it (e.g. CF-Connecting-IP); only set it if clients can't reach the origin
+# directly, or they can pick their own address
+CLIENT_IP_HEADER = os.getenv("CLIENT_IP_HEADER")
+
+# Grid points and forecasts are saved here when a worker exits and restored
+# by warmup() before the next one starts serving
+CACHE_SNAPSHOT_FILE = os.getenv("CACHE_SNAPSHOT_FILE", os.path.join(tempfile.gettempdir(), "sunbathing_checker_cache.json"))
+# Seconds warmup() may spend on NWS calls (grid points and alerts)
+WARMUP_BUDGET = 10
+
+# Memory budget in MB for each worker's caches, split between them by
+# CACHE_SHARES. Lower it to fit more workers on a box.
+CACHE_MEMORY_MB = float(os.getenv("CACHE_MEMORY_MB", "64"))
+CACHE_SHARES = {
+    "points": 0.02,
+    "forecasts": 0.25,
+    "alerts": 0.08,
+    "gridpoints": 0.40,
+    "evaluations": 0.25
+}
+
+def _cache_budget(name):
+    return int(CACHE_MEMORY_MB * CACHE_SHARES[name] * 1024 * 1024)
+
+# Expired forecasts are still served (flagged as stale) while NWS is down,
+# up to this age in seconds
+FORECAST_STALE_MAX_AGE = 24 * 3600
+
+# NWS request timeouts in seconds (connect, read)
+NWS_TIMEOUT = (3.05, 10)
+# Total seconds one page request may spend on NWS calls, well under
+# gunicorn's 30s worker timeout: a hung NWS must not get the worker killed
+# before the circuit breaker has seen enough failures to open
+NWS_REQUEST_BUDGET = 8
+
+# Client-side token bucket for NWS calls, shared by all threads and workers on
+# the host through NWS_RATE_LIMIT_FILE. NWS throttles per User-Agent.
+NWS_RATE_LIMIT = float(os.getenv("NWS_RATE_LIMIT", "5"))  # requests per second
+NWS_RATE_BURST = int(os.getenv("NWS_RATE_BURST", "10"))
+NWS_RATE_LIMIT_FILE = os.getenv("NWS_RATE_LIMIT_FILE", os.path.join(tempfile.gettempdir(), "sunbathing_checker_nws_bucket"))
+# Tokens background refreshes leave for user-facing requests
+NWS_RATE_BACKGROUND_RESERVE = 3
+# Longest a call waits for a token before giving up, by priority
+NWS_RATE_MAX_WAIT = {"user": 2.0, "background": 30.0}
+
+# Circuit breaker around NWS: open after this many consecutive failures
+# (errors, 429s or calls slower than CIRCUIT_SLOW_CALL_SECONDS), then allow a
+# single probe request after CIRCUIT_RESET_TIMEOUT seconds.
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_SLOW_CALL_SECONDS = 5
+CIRCUIT_RESET_TIMEOUT = 30
+
 LOCATIONS = {
     "Naples": {"lat": 26.1420, "lon": -81.7948},
     "Fort Lauderdale": {"lat": 26.1224, "lon": -80.1373},
@@ -148,18 +244,623 @@ def get_wind_icon(wind_speed_str):
     except (ValueError, IndexError):
         return '💨' # Default if parsing fails
 
-def get_forecast(lat, lon):
-    points_url = f"https://api.weather.gov/points/{lat},{lon}"
+class NWSUnavailable(requests.RequestException):
+    """Raised without calling NWS while the circuit breaker is open."""
+
+class NWSRateLimited(requests.RequestException):
+    """Raised when no rate limiter token became available within the allowed wait."""
+
+class NWSInvalidResponse(requests.RequestException):
+    """Raised when an NWS response body doesn't have the expected shape."""
+
+# Bucket state in NWS_RATE_LIMIT_FILE: tokens, last refill time, and the time
+# until which NWS asked us to back off (Retry-After on a 429)
+_BUCKET_FORMAT = struct.Struct("ddd")
+_RATE_LOCK = threading.Lock()
+_RATE_STATS = {"acquired": 0, "rejected": 0, "waited_seconds": 0.0, "throttled": 0}
+_LOCAL_BUCKET = {}
+
+def _update_bucket(update):
+    """
+    Apply update(tokens, blocked_until, now) -> (state, result) to the
+    shared bucket under an exclusive lock and return result. tokens is
+    already refilled up to now; state is the new
+    (tokens, refilled_at, blocked_until) to store.
+    """
+    with _RATE_LOCK:
+        fd = None
+        if fcntl is not None:
+            try:
+                fd = os.open(NWS_RATE_LIMIT_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+            except OSError as e:
+                print(f"NWS rate limiter falling back to a per-process bucket: {e}")
+        try:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                raw = os.pread(fd, _BUCKET_FORMAT.size, 0)
+                state = _BUCKET_FORMAT.unpack(raw) if len(raw) == _BUCKET_FORMAT.size else None
+            else:
+                state = _LOCAL_BUCKET.get("state")
+            now = time.time()
+            tokens, refilled_at, blocked_until = state or (NWS_RATE_BURST, now, 0.0)
+            tokens = min(NWS_RATE_BURST, tokens + max(0.0, now - refilled_at) * NWS_RATE_LIMIT)
+            state, result = update(tokens, blocked_until, now)
+            if fd is not None:
+                os.pwrite(fd, _BUCKET_FORMAT.pack(*state), 0)
+            else:
+                _LOCAL_BUCKET["state"] = state
+            return result
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+def _take_token(priority):
+    """Take a token if one is free for this priority; return seconds to wait otherwise."""
+    # A reserve as large as the burst would starve background callers for good
+    floor = min(NWS_RATE_BACKGROUND_RESERVE, NWS_RATE_BURST - 1) if priority == "background" else 0
+    
+    def update(tokens, blocked_until, now):
+        if now < blocked_until:
+            return (tokens, now, blocked_until), blocked_until - now
+        if tokens >= floor + 1:
+            return (tokens - 1, now, blocked_until), 0.0
+        return (tokens, now, blocked_until), (floor + 1 - tokens) / NWS_RATE_LIMIT
+    
+    return _update_bucket(update)
+
+def acquire_nws_token(priority="user", max_wait=None):
+    """
+    Block until the shared rate limiter grants an NWS call, waiting at most
+    NWS_RATE_MAX_WAIT[priority] (or max_wait, if shorter). Background callers
+    leave NWS_RATE_BACKGROUND_RESERVE tokens for user-facing requests.
+    """
+    start = time.monotonic()
+    wait_limit = NWS_RATE_MAX_WAIT.get(priority, NWS_RATE_MAX_WAIT["user"])
+    deadline = start + (wait_limit if max_wait is None else min(wait_limit, max_wait))
+    while True:
+        wait = _take_token(priority)
+        if wait == 0:
+            with _RATE_LOCK:
+                _RATE_STATS["acquired"] += 1
+                _RATE_STATS["waited_seconds"] += time.monotonic() - start
+            return
+        if time.monotonic() + wait > deadline:
+            with _RATE_LOCK:
+                _RATE_STATS["rejected"] += 1
+            raise NWSRateLimited(f"NWS request budget exhausted for {priority} requests")
+        time.sleep(wait)
+
+def _back_off_nws(retry_after):
+    """Empty the shared bucket and hold all workers off after an NWS 429."""
+    def update(tokens, blocked_until, now):
+        return (0.0, now, max(blocked_until, now + retry_after)), None
+    
+    _update_bucket(update)
+    with _RATE_LOCK:
+        _RATE_STATS["throttled"] += 1
+
+def rate_limiter_state():
+    """Current NWS request budget usage, for the /metrics endpoint."""
+    tokens, blocked_until = _update_bucket(lambda tokens, blocked_until, now: ((tokens, now, blocked_until), (tokens, blocked_until)))
+    with _RATE_LOCK:
+        stats = dict(_RATE_STATS)
+    stats.update(
+        tokens_available=round(tokens, 2),
+        capacity=NWS_RATE_BURST,
+        rate_per_second=NWS_RATE_LIMIT,
+        budget_used=round(1 - tokens / NWS_RATE_BURST, 3) if NWS_RATE_BURST else 0,
+        blocked_for_seconds=round(max(0.0, blocked_until - time.time()), 1),
+        shared=fcntl is not None
+    )
+    return stats
+
+# Circuit breaker state shared by all NWS calls in this process
+_CIRCUIT = {"state": "closed", "failures": 0, "opened_at": 0.0, "probing": False}
+_CIRCUIT_LOCK = threading.Lock()
+
+def _circuit_allow():
+    """Return True if a call may go to NWS, moving open -> half-open when due."""
+    with _CIRCUIT_LOCK:
+        if _CIRCUIT["state"] == "closed":
+            return True
+        if _CIRCUIT["state"] == "open" and time.time() - _CIRCUIT["opened_at"] >= CIRCUIT_RESET_TIMEOUT:
+            _CIRCUIT["state"] = "half_open"
+        if _CIRCUIT["state"] == "half_open" and not _CIRCUIT["probing"]:
+            _CIRCUIT["probing"] = True
+            return True
+        return False
+
+def _circuit_record(success):
+    with _CIRCUIT_LOCK:
+        _CIRCUIT["probing"] = False
+        if success:
+            _CIRCUIT.update(state="closed", failures=0)
+            return
+        _CIRCUIT["failures"] += 1
+        if _CIRCUIT["state"] == "half_open" or _CIRCUIT["failures"] >= CIRCUIT_FAILURE_THRESHOLD:
+            if _CIRCUIT["state"] != "open":
+                print(f"NWS circuit breaker opened after {_CIRCUIT['failures']} failures")
+            _CIRCUIT.update(state="open", opened_at=time.time())
+
+def circuit_state():
+    """Snapshot of the circuit breaker for diagnostics."""
+    with _CIRCUIT_LOCK:
+        return dict(_CIRCUIT)
+
+# Monotonic deadline for the current thread's NWS calls, see set_nws_deadline
+_NWS_DEADLINE = threading.local()
+
+def set_nws_deadline(seconds):
+    """Limit the current thread's NWS calls to the next `seconds` in total; None lifts the limit."""
+    _NWS_DEADLINE.at = None if seconds is None else time.monotonic() + seconds
+
+def _nws_time_left():
+    at = getattr(_NWS_DEADLINE, "at", None)
+    return None if at is None else at - time.monotonic()
+
+def _release_probe():
+    # The call didn't reach NWS; let the next one probe instead
+    with _CIRCUIT_LOCK:
+        _CIRCUIT["probing"] = False
+
+def nws_get(url, params=None, priority="user"):
+    """
+    GET an NWS URL through the circuit breaker and rate limiter. Fails fast
+    with NWSUnavailable while the circuit is open or the current request's
+    NWS time budget is used up, and with NWSRateLimited when the request
+    budget stays exhausted; otherwise behaves like requests.get followed by
+    raise_for_status(). priority is "user" for page requests and
+    "background" for refreshes nobody is waiting on.
+    """
+    time_left = _nws_time_left()
+    if time_left is not None and time_left <= 0:
+        raise NWSUnavailable(f"NWS time budget for this request is used up, not calling {url}")
+    if not _circuit_allow():
+        raise NWSUnavailable(f"NWS circuit breaker is open, not calling {url}")
+    try:
+        acquire_nws_token(priority, max_wait=time_left)
+    except NWSRateLimited:
+        _release_probe()
+        raise
+    
+    timeout = NWS_TIMEOUT
+    time_left = _nws_time_left()
+    if time_left is not None:
+        if time_left <= 0:
+            _release_probe()
+            raise NWSUnavailable(f"NWS time budget for this request is used up, not calling {url}")
+        timeout = (min(NWS_TIMEOUT[0], time_left), min(NWS_TIMEOUT[1], time_left))
+    
     headers = {"User-Agent": USER_AGENT, "Accept": "application/geo+json"}
-    resp_points = requests.get(points_url, headers=headers)
-    resp_points.raise_for_status()
-    forecast_url = resp_points.json()["properties"]["forecast"]
+    start = time.monotonic()
+    try:
+        resp = requests.get(url, params=params, headers=headers, timeout=timeout)
+        resp.raise_for_status()
+    except requests.HTTPError as e:
+        # Client errors other than throttling mean NWS itself is healthy
+        status = e.response.status_code if e.response is not None else 500
+        if status == 429:
+            retry_after = e.response.headers.get("Retry-After", "")
+            _back_off_nws(int(retry_after) if retry_after.isdigit() else 5)
+        _circuit_record(status < 500 and status != 429)
+        raise
+    except requests.RequestException:
+        _circuit_record(False)
+        raise
+    _circuit_record(time.monotonic() - start <= CIRCUIT_SLOW_CALL_SECONDS)
+    return resp
+
+# Grid point metadata per (lat, lon); NWS grid assignments rarely change
+_POINTS_CACHE = BoundedCache("points", _cache_budget("points"))
+
+# Trimmed forecasts per forecast URL: {url: {"data", "fetched_at", "expires_at"}}
+_FORECAST_CACHE = BoundedCache("forecasts", _cache_budget("forecasts"))
+
+# The only period fields parse_next_7_days and the evaluation use
+FORECAST_PERIOD_FIELDS = (
+    "name",
+    "startTime",
+    "endTime",
+    "isDaytime",
+    "temperature",
+    "temperatureUnit",
+    "windSpeed",
+    "windDirection",
+    "shortForecast",
+    "detailedForecast"
+)
+
+@functools.lru_cache(maxsize=None)
+def _json_decoders():
+    """
+    Import the optional faster JSON decoders on first use (or during warmup)
+    rather than at import time. Returns (msgspec, orjson, schemas); missing
+    modules are None and the stdlib json module is the fallback.
+    """
+    try:
+        import msgspec
+    except ImportError:
+        msgspec = None
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+    if msgspec is None:
+        return None, orjson, {}
     
-    # Get the full 7-day forecast
-    resp_forecast = requests.get(forecast_url, headers=headers)
-    resp_forecast.raise_for_status()
+    # Typed schemas: msgspec skips everything not declared here (geometry,
+    # elevation, unused properties) without building Python objects for it.
+    class _ForecastPeriod(msgspec.Struct):
+        name: str
+        startTime: str
+        isDaytime: bool
+        temperature: Union[int, float, None]
+        temperatureUnit: str
+        windSpeed: str
+        shortForecast: str
+        detailedForecast: str
+        endTime: Optional[str] = None
+        windDirection: str = ""
+    
+    class _ForecastProperties(msgspec.Struct):
+        periods: List[_ForecastPeriod]
+        updateTime: Optional[str] = None
+    
+    class _Forecast(msgspec.Struct):
+        properties: _ForecastProperties
     
-    forecast_data = resp_forecast.json()
+    class _GridpointValue(msgspec.Struct):
+        validTime: str
+        value: Union[int, float, None]
+    
+    class _GridpointLayerData(msgspec.Struct):
+        values: List[_GridpointValue]
+        uom: str = ""
+    
+    class _GridpointProperties(msgspec.Struct):
+        skyCover: Optional[_GridpointLayerData] = None
+        probabilityOfPrecipitation: Optional[_GridpointLayerData] = None
+    
+    class _Gridpoint(msgspec.Struct):
+        properties: _GridpointProperties
+    
+    return msgspec, orjson, {"forecast": _Forecast, "gridpoint": _Gridpoint}
+
+def decode_json(content, schema=None):
+    """
+    Decode an NWS response body. With msgspec installed and a known schema
+    ('forecast' or 'gridpoint') only the declared fields are decoded;
+    otherwise orjson is used when available, then the stdlib json module.
+    """
+    msgspec, orjson, schemas = _json_decoders()
+    if schema in schemas:
+        return msgspec.to_builtins(msgspec.json.decode(content, type=schemas[schema]))
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+def decode_nws_response(resp, parse, schema=None):
+    """
+    Decode an NWS response with decode_json and read it with parse. A body of
+    the wrong shape raises NWSInvalidResponse, so callers treat it like any
+    other NWS failure (stale fallback, skipping just that location).
+    """
+    try:
+        return parse(decode_json(resp.content, schema))
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise NWSInvalidResponse(f"Unexpected response from {resp.url}: {e}") from e
+
+def trim_forecast(forecast_data):
+    """Drop geometry and unused properties, keeping only the fields we read."""
+    properties = forecast_data["properties"]
+    return {
+        "properties": {
+            "updateTime": properties.get("updateTime"),
+            "periods": [
+                {field: period.get(field) for field in FORECAST_PERIOD_FIELDS}
+                for period in properties["periods"]
+            ]
+        }
+    }
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+def _cache_expiry(headers, default_ttl):
+    """Return the expiry time from a response's Cache-Control max-age."""
+    match = _MAX_AGE.search(headers.get("Cache-Control", ""))
+    return time.time() + (int(match.group(1)) if match else default_ttl)
+
+# Active alerts per area: {area: {"fetched_at": ts, "by_zone": {zone_id: [alert, ...]}}}
+_ALERT_CACHE = BoundedCache("alerts", _cache_budget("alerts"))
+_ALERT_LOCK = threading.Lock()
+
+def _zone_id(zone_url):
+    """Return the zone id (e.g. 'FLZ173') from an NWS zone URL."""
+    return zone_url.rstrip("/").rsplit("/", 1)[-1] if zone_url else None
+
+def get_point_metadata(lat, lon, priority="user"):
+    """Resolve the forecast URLs and alert zones for a coordinate via /points."""
+    key = (lat, lon)
+    point = _POINTS_CACHE.get(key)
+    if point is not None:
+        return point
+    
+    resp_points = nws_get(f"{NWS_API_BASE}/points/{lat},{lon}", priority=priority)
+    point = decode_nws_response(resp_points, _parse_point)
+    _POINTS_CACHE[key] = point
+    return point
+
+def _parse_point(points_data):
+    properties = points_data["properties"]
+    relative_location = properties.get("relativeLocation") or {}
+    return {
+        "forecast": properties["forecast"],
+        "forecastHourly": properties.get("forecastHourly"),
+        "forecastGridData": properties.get("forecastGridData"),
+        "forecastZone": _zone_id(properties.get("forecastZone")),
+        "county": _zone_id(properties.get("county")),
+        "state": (relative_location.get("properties") or {}).get("state")
+    }
+
+def refresh_alerts(area, priority="user"):
+    """
+    Fetch all active alerts for an area (state) in one bulk query and index
+    them by every zone they affect, de-duplicated by alert id.
+    """
+    resp = nws_get(f"{NWS_API_BASE}/alerts/active", params={"area": area}, priority=priority)
+    entry = {"fetched_at": time.time(), "by_zone": decode_nws_response(resp, _index_alerts)}
+    _ALERT_CACHE[area] = entry
+    return entry
+
+def _index_alerts(alerts_data):
+    """Alerts by zone id: {zone: [alert]}."""
+    by_zone = {}
+    for feature in alerts_data.get("features", []):
+        properties = feature.get("properties", {})
+        alert = {
+            "id": properties.get("id") or feature.get("id"),
+            "event": properties.get("event", ""),
+            "severity": properties.get("severity", ""),
+            "headline": properties.get("headline", ""),
+            "onset": properties.get("onset") or properties.get("effective"),
+            "ends": properties.get("ends") or properties.get("expires")
+        }
+        zones = set(properties.get("geocode", {}).get("UGC", []))
+        zones.update(_zone_id(url) for url in properties.get("affectedZones", []))
+        for zone in zones:
+            by_zone.setdefault(zone, {})[alert["id"]] = alert
+    return {zone: list(alerts.values()) for zone, alerts in by_zone.items()}
+
+def get_active_alerts(point, priority="user"):
+    """Return the active alerts for a point's forecast zone and county."""
+    area = point.get("state")
+    if not area:
+        return []
+    
+    with _ALERT_LOCK:
+        entry = _ALERT_CACHE.get(area)
+        if entry is None or time.time() - entry["fetched_at"] > ALERT_CACHE_TTL:
+            try:
+                entry = refresh_alerts(area, priority)
+            except requests.RequestException:
+                # Keep using the last known alerts while NWS is degraded
+                if entry is None:
+                    raise
+    
+    alerts = {}
+    for zone in (point.get("forecastZone"), point.get("county")):
+        for alert in entry["by_zone"].get(zone, []):
+            alerts[alert["id"]] = alert
+    return list(alerts.values())
+
+def _parse_time(value):
+    return datetime.datetime.fromisoformat(value.replace('Z', '+00:00')) if value else None
+
+def alerts_for_period(alerts, period):
+    """Return the alerts whose onset/end window overlaps the forecast period."""
+    period_start = _parse_time(period.get("startTime"))
+    period_end = _parse_time(period.get("endTime"))
+    matching = []
+    for alert in alerts or []:
+        onset = _parse_time(alert.get("onset"))
+        ends = _parse_time(alert.get("ends"))
+        if period_end and onset and onset >= period_end:
+            continue
+        if period_start and ends and ends <= period_start:
+            continue
+        matching.append(alert)
+    return matching
+
+# Decoded gridpoint layers per forecastGridData URL:
+# {url: {"fetched_at": ts, "layers": {name: GridpointLayer}}}
+_GRIDPOINT_CACHE = BoundedCache("gridpoints", _cache_budget("gridpoints"))
+
+# Raw gridpoint layers each weather condition option is scored on
+GRIDPOINT_LAYERS_BY_CONDITION = {
+    "sunball": ("skyCover", "probabilityOfPrecipitation"),
+    "clouds": ("skyCover", "probabilityOfPrecipitation"),
+    "not_rain": ("probabilityOfPrecipitation",)
+}
+
+_ISO_DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?)?$")
+
+def _parse_duration(duration):
+    """Return the length in seconds of an ISO-8601 duration like 'PT3H' or 'P1DT6H'."""
+    match = _ISO_DURATION.match(duration)
+    if not match:
+        raise ValueError(f"Unsupported duration: {duration}")
+    days, hours, minutes = (int(part or 0) for part in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60
+
+class GridpointLayer:
+    """
+    One raw gridpoint time series, kept as compact arrays of interval start
+    and end times (epoch seconds) and values. Intervals are summarized over a
+    time window directly, without expanding them to hourly values. Intervals
+    are kept sorted and don't overlap, so both starts and ends are ascending.
+    """
+    __slots__ = ("uom", "starts", "ends", "values")
+    
+    def __init__(self, uom, entries):
+        self.uom = uom
+        self.starts = array("q")
+        self.ends = array("q")
+        self.values = array("d")
+        intervals = []
+        for entry in entries:
+            start, duration = entry["validTime"].split("/")
+            start = int(_parse_time(start).timestamp())
+            intervals.append((start, start + _parse_duration(duration), math.nan if entry["value"] is None else float(entry["value"])))
+        intervals.sort()
+        for start, end, value in intervals:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.values.append(value)
+    
+    def to_dict(self):
+        return {"uom": self.uom, "starts": self.starts.tolist(), "ends": self.ends.tolist(), "values": self.values.tolist()}
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a layer saved with to_dict (e.g. from a cache snapshot)."""
+        layer = cls(data["uom"], [])
+        layer.starts.fromlist(data["starts"])
+        layer.ends.fromlist(data["ends"])
+        layer.values.fromlist(data["values"])
+        return layer
+    
+    def _overlapping(self, start, end):
+        # First interval ending after start through the last one starting before end
+        first = bisect.bisect_right(self.ends, start)
+        last = bisect.bisect_left(self.starts, end, first)
+        for i in range(first, last):
+            interval_start, interval_end, value = self.starts[i], self.ends[i], self.values[i]
+            overlap = min(end, interval_end) - max(start, interval_start)
+            if overlap > 0 and not math.isnan(value):
+                yield overlap, value
+    
+    def mean(self, start, end):
+        """Time-weighted mean over [start, end), or None without data."""
+        total = weighted = 0
+        for overlap, value in self._overlapping(start, end):
+            total += overlap
+            weighted += overlap * value
+        return weighted / total if total else None
+    
+    def max(self, start, end):
+        """Maximum over [start, end), or None without data."""
+        return max((value for _, value in self._overlapping(start, end)), default=None)
+
+def gridpoint_layers_for(criteria):
+    """Return the raw gridpoint layers needed to score the given criteria."""
+    return GRIDPOINT_LAYERS_BY_CONDITION.get(criteria.get("required_condition"), ())
+
+def decode_gridpoint_layers(gridpoint_data, layers):
+    """Decode only the requested layers of a /gridpoints payload."""
+    properties = gridpoint_data["properties"]
+    decoded = {}
+    for name in layers:
+        layer = properties.get(name)
+        if layer and layer.get("values"):
+            decoded[name] = GridpointLayer(layer.get("uom", ""), layer["values"])
+    return decoded
+
+def get_gridpoint_layers(point, layers, priority="user"):
+    """Return the requested raw gridpoint layers for a point, fetching as needed."""
+    grid_url = point.get("forecastGridData")
+    if not grid_url or not layers:
+        return {}
+    
+    entry = _GRIDPOINT_CACHE.get(grid_url)
+    fresh = entry is not None and time.time() - entry["fetched_at"] <= GRIDPOINT_CACHE_TTL
+    if not fresh or any(name not in entry["layers"] for name in layers):
+        # Refresh the layers already cached along with the newly requested ones
+        wanted = set(layers) | (set(entry["layers"]) if fresh else set())
+        try:
+            resp = nws_get(grid_url, priority=priority)
+            decoded = decode_nws_response(resp, lambda data: decode_gridpoint_layers(data, wanted), "gridpoint")
+        except requests.RequestException:
+            # Keep using the last decoded layers while NWS is degraded
+            if entry is None:
+                raise
+        else:
+            entry = {"fetched_at": time.time(), "layers": decoded}
+            _GRIDPOINT_CACHE[grid_url] = entry
+    
+    return {name: entry["layers"][name] for name in layers if name in entry["layers"]}
+
+def attach_gridpoint_data(period, layers):
+    """
+    Summarize the raw gridpoint layers over a forecast period and store them
+    on the period: mean sky cover, and maxima for the other layers.
+    """
+    start = _parse_time(period.get("startTime"))
+    end = _parse_time(period.get("endTime"))
+    if not start or not end:
+        return period
+    start, end = int(start.timestamp()), int(end.timestamp())
+    for name, layer in layers.items():
+        value = layer.mean(start, end) if name == "skyCover" else layer.max(start, end)
+        if value is not None:
+            period[name] = round(value)
+    return period
+
+def location_tag(location):
+    """Cache-Tag (surrogate key) for pages that include a location, e.g. 'loc-miami-fl'."""
+    return "loc-" + re.sub(r"[^a-z0-9]+", "-", location.lower()).strip("-")
+
+def purge_edge_cache(tags):
+    """Ask Cloudflare to purge edge-cached responses with the given Cache-Tags, in the background."""
+    if not tags or not (CF_ZONE_ID and CF_API_TOKEN):
+        return
+    
+    def purge():
+        try:
+            resp = requests.post(
+                f"https://api.cloudflare.com/client/v4/zones/{CF_ZONE_ID}/purge_cache",
+                json={"tags": tags},
+                headers={"Authorization": f"Bearer {CF_API_TOKEN}"},
+                timeout=NWS_TIMEOUT
+            )
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Could not purge edge cache for {tags}: {e}")
+    
+    threading.Thread(target=purge, daemon=True).start()
+
+def get_forecast_entry(lat, lon, priority="user"):
+    """
+    Return the forecast cache entry for a coordinate, refreshing it from NWS
+    when expired. If NWS fails or the circuit breaker is open, the last known
+    good forecast is returned with "stale" set instead of raising, as long as
+    it is younger than FORECAST_STALE_MAX_AGE.
+    """
+    point = get_point_metadata(lat, lon, priority)
+    forecast_url = point["forecast"]
+    
+    entry = _FORECAST_CACHE.get(forecast_url)
+    if entry is not None and time.time() < entry["expires_at"]:
+        return dict(entry, stale=False)
+    
+    # Get the full 7-day forecast
+    try:
+        resp_forecast = nws_get(forecast_url, priority=priority)
+        forecast_data = decode_nws_response(resp_forecast, trim_forecast, "forecast")
+    except requests.RequestException as e:
+        if entry is not None and time.time() - entry["fetched_at"] <= FORECAST_STALE_MAX_AGE:
+            print(f"Serving stale forecast for {lat}, {lon}: {e}")
+            return dict(entry, stale=True)
+        raise
+
+    if entry is not None and entry["data"]["properties"].get("updateTime") != forecast_data["properties"].get("updateTime"):
+        purge_edge_cache([location_tag(name) for name, coords in CITY_COORDINATES.items() if coords == (lat, lon)])
+    entry = {
+        "data": forecast_data,
+        "fetched_at": time.time(),
+        "expires_at": _cache_expiry(resp_forecast.headers, FORECAST_CACHE_TTL)
+    }
+    # The trimmed, decoded forecast takes about twice the payload's length
+    _FORECAST_CACHE.set(forecast_url, entry, size=2 * len(resp_forecast.content))
     print("\nForecast data for coordinates:", lat, lon)
     first_period = forecast_data["properties"]["periods"][0]
     print("First period data:", {
@@ -169,36 +870,55 @@ def get_forecast(lat, lon):
         "shortForecast": first_period["shortForecast"]
     })
     
-    return forecast_data
+    return dict(entry, stale=False)
+
+def period_date(period):
+    """The date a forecast period is listed under, e.g. 'Saturday, June 14'."""
+    # The local date of its start, which leads the ISO 8601 timestamp
+    return _date_label(period["startTime"][:10])
+
+@functools.lru_cache(maxsize=64)
+def _date_label(iso_date):
+    return datetime.date.fromisoformat(iso_date).strftime("%A, %B %d")
+
+def simplify_period(period):
+    """
+    Create a simplified period object with only the fields we know exist, as
+    a copy that's safe to add gridpoint summaries to and convert.
+    """
+    return {
+        "name": period["name"],
+        "startTime": period["startTime"],
+        "endTime": period.get("endTime"),
+        "temperature": period["temperature"],
+        "temperatureUnit": period["temperatureUnit"],
+        "windSpeed": period["windSpeed"],
+        "windDirection": period.get("windDirection", ""),
+        "shortForecast": period["shortForecast"],
+        "detailedForecast": period["detailedForecast"],
+        "isDaytime": period["isDaytime"]
+    }
 
 def parse_next_7_days(forecast_data):
+    """
+    Group the forecast's periods by date: [{"date", "periods": [(label, period)]}].
+    The periods are the cached forecast's own; copy them with simplify_period
+    before changing them.
+    """
     periods = forecast_data["properties"]["periods"]
     
     # Get up to 7 days of forecasts (14 periods for day/night)
     results = []
     current_date = None
     for period in periods[:14]:  # Extended from 6 to 14 periods
-        start_time = datetime.datetime.fromisoformat(period["startTime"].replace('Z', '+00:00'))
-        date_str = start_time.strftime("%A, %B %d")
+        date_str = period_date(period)
         
         if date_str != current_date:
             current_date = date_str
             results.append({"date": date_str, "periods": []})
         
-        # Create a simplified period object with only the fields we know exist
-        simplified_period = {
-            "name": period["name"],
-            "temperature": period["temperature"],
-            "temperatureUnit": period["temperatureUnit"],
-            "windSpeed": period["windSpeed"],
-            "windDirection": period.get("windDirection", ""),
-            "shortForecast": period["shortForecast"],
-            "detailedForecast": period["detailedForecast"],
-            "isDaytime": period["isDaytime"]
-        }
-        
         label = "Night" if not period["isDaytime"] else "Day"
-        results[-1]["periods"].append((label, simplified_period))
+        results[-1]["periods"].append((label, period))
     return results
 
 def is_acceptable_condition(condition, selected_conditions):
@@ -255,6 +975,49 @@ def is_acceptable_condition(condition, selected_conditions):
     
     return False
 
+# Numeric thresholds matching the NWS wording: sky cover up to "Partly Sunny"
+# (62%) for sunball, up to "Mostly Cloudy" (87%) for clouds, and at most a
+# "Slight Chance" (20%) of precipitation.
+SKY_COVER_SUNBALL_MAX = 62
+SKY_COVER_CLOUDS_MAX = 87
+PRECIP_PROBABILITY_MAX = 20
+
+def is_acceptable_gridpoint_condition(period, selected_conditions):
+    """
+    Evaluate the condition criteria from raw gridpoint numbers attached to
+    the period. Returns None when the needed numbers are missing.
+    """
+    sky_cover = period.get("skyCover")
+    precip = period.get("probabilityOfPrecipitation")
+    if precip is None:
+        return None
+    
+    if selected_conditions == 'sunball':
+        if sky_cover is None:
+            return None
+        return sky_cover <= SKY_COVER_SUNBALL_MAX and precip <= PRECIP_PROBABILITY_MAX
+    elif selected_conditions == 'clouds':
+        if sky_cover is None:
+            return None
+        return sky_cover <= SKY_COVER_CLOUDS_MAX and precip <= PRECIP_PROBABILITY_MAX
+    elif selected_conditions == 'not_rain':
+        return precip <= PRECIP_PROBABILITY_MAX
+    return None
+
+def is_acceptable_period(period, selected_conditions):
+    """
+    Numeric gridpoint evaluation when available, text forecast matching
+    otherwise. The clouds and not_rain options still accept a forecast worded
+    as only a slight chance of rain, as the text matching does, even when the
+    numbers alone would reject it.
+    """
+    condition_ok = is_acceptable_gridpoint_condition(period, selected_conditions)
+    if condition_ok is None:
+        return is_acceptable_condition(period['shortForecast'], selected_conditions)
+    if not condition_ok and selected_conditions in ('clouds', 'not_rain') and 'slight' in period['shortForecast'].lower():
+        return True
+    return condition_ok
+
 def evaluate_min_temperature(temp, min_temp):
     """
     Evaluate minimum temperature and return rating level:
@@ -303,6 +1066,32 @@ def evaluate_wind_speed(wind_speed, max_wind):
         return 1
     return 0
 
+# Active alerts that override the weather-based rating: the most flamingos a
+# period can get while the alert is in effect.
+ALERT_RATING_CAPS = {
+    "Rip Current Statement": 0,
+    "High Surf Warning": 0,
+    "Excessive Heat Warning": 0,
+    "Extreme Heat Warning": 0,
+    "Severe Thunderstorm Warning": 0,
+    "Tornado Warning": 0,
+    "Tropical Storm Warning": 0,
+    "Hurricane Warning": 0,
+    "High Surf Advisory": 1,
+    "Hurricane Watch": 1,
+    "Heat Advisory": 2,
+    "Beach Hazards Statement": 2,
+    "Tropical Storm Watch": 2,
+    "Wind Advisory": 2,
+    "Air Quality Alert": 3
+}
+
+def apply_alert_override(rating, alerts):
+    """Cap a flamingo rating by the active alerts in ALERT_RATING_CAPS."""
+    for alert in alerts or []:
+        rating = min(rating, ALERT_RATING_CAPS.get(alert["event"], rating))
+    return rating
+
 def calculate_flamingo_rating(evaluation):
     """Calculate number of flamingos based on conditions, temperature, and wind ratings"""
     # Start with 5 flamingos
@@ -336,36 +1125,107 @@ def calculate_flamingo_rating(evaluation):
     if not evaluation['condition_ok']:
         return 0  # Automatic fail for unacceptable conditions
     
+    # Active alerts (rip currents, heat advisories, ...) override the weather
+    rating = apply_alert_override(rating, evaluation.get('alerts'))
+    
     return max(0, rating)  # Ensure rating doesn't go below 0
 
-def is_great_sunbathing_day(day_period, criteria):
+# Bounds of the precomputed rating tables. NWS forecast temperatures (°F) and
+# wind speeds (mph) are integers well inside these ranges; anything outside
+# falls back to the evaluate_* functions.
+RATING_TABLE_TEMP_RANGE = (-80, 150)
+RATING_TABLE_WIND_RANGE = (0, 200)
+RATING_TABLE_CACHE_SIZE = 128
+
+def _build_flamingo_table():
+    """Precompute calculate_flamingo_rating for every combination of ratings."""
+    table = bytearray(4 * 4 * 4 * 2)
+    for min_temp_rating in range(4):
+        for max_temp_rating in range(4):
+            for wind_rating in range(4):
+                for condition_ok in (False, True):
+                    index = ((min_temp_rating * 4 + max_temp_rating) * 4 + wind_rating) * 2 + condition_ok
+                    table[index] = calculate_flamingo_rating({
+                        'min_temp_rating': min_temp_rating,
+                        'max_temp_rating': max_temp_rating,
+                        'wind_rating': wind_rating,
+                        'condition_ok': condition_ok
+                    })
+    return bytes(table)
+
+FLAMINGO_RATING_TABLE = _build_flamingo_table()
+
+@functools.lru_cache(maxsize=RATING_TABLE_CACHE_SIZE)
+def build_rating_tables(min_temp, max_temp, max_wind):
+    """
+    Build lookup tables for one set of criteria, over every integer in the
+    RATING_TABLE_*_RANGE bounds, returned as a tuple of:
+        temperature -> (min_temp_rating, max_temp_rating)
+        wind speed -> wind_rating
+        the criteria, for values outside the tables
+    Tables are cached by criteria tuple with LRU eviction.
+    """
+    temp_start, temp_end = RATING_TABLE_TEMP_RANGE
+    wind_start, wind_end = RATING_TABLE_WIND_RANGE
+    temp_table = {
+        t: (evaluate_min_temperature(t, min_temp), evaluate_max_temperature(t, max_temp))
+        for t in range(temp_start, temp_end + 1)
+    }
+    wind_table = {w: evaluate_wind_speed(w, max_wind) for w in range(wind_start, wind_end + 1)}
+    return temp_table, wind_table, (min_temp, max_temp, max_wind)
+
+def rating_tables(criteria):
+    """The lookup tables for criteria; resolve them once, not per rating."""
+    return build_rating_tables(criteria['min_temp'], criteria['max_temp'], criteria['max_wind'])
+
+def lookup_ratings(temp, wind_speed, tables):
+    """
+    Return (min_temp_rating, max_temp_rating, wind_rating) for the given values
+    from tables (see rating_tables). Values outside the tables go through the
+    evaluate_* functions, so results are identical either way.
+    """
+    temp_ratings = tables[0].get(temp)
+    wind_rating = tables[1].get(wind_speed)
+    if temp_ratings is None or wind_rating is None:
+        min_temp, max_temp, max_wind = tables[2]
+        if temp_ratings is None:
+            temp_ratings = evaluate_min_temperature(temp, min_temp), evaluate_max_temperature(temp, max_temp)
+        if wind_rating is None:
+            wind_rating = evaluate_wind_speed(wind_speed, max_wind)
+    return temp_ratings + (wind_rating,)
+
+def lookup_flamingo_rating(min_temp_rating, max_temp_rating, wind_rating, condition_ok):
+    """Table-driven equivalent of calculate_flamingo_rating."""
+    return FLAMINGO_RATING_TABLE[((min_temp_rating * 4 + max_temp_rating) * 4 + wind_rating) * 2 + bool(condition_ok)]
+
+def is_great_sunbathing_day(day_period, criteria, alerts=None, tables=None):
     temp = day_period['temperature']
-    min_temp_rating = evaluate_min_temperature(temp, criteria['min_temp'])
-    max_temp_rating = evaluate_max_temperature(temp, criteria['max_temp'])
     wind_speed = parse_wind_speed(day_period['windSpeed'])
-    wind_rating = evaluate_wind_speed(wind_speed, criteria['max_wind'])
-    condition_ok = is_acceptable_condition(day_period['shortForecast'], criteria['required_condition'])
+    min_temp_rating, max_temp_rating, wind_rating = lookup_ratings(temp, wind_speed, tables or rating_tables(criteria))
+    condition_ok = is_acceptable_period(day_period, criteria['required_condition'])
+    
+    period_alerts = alerts_for_period(alerts, day_period)
     
     evaluation = {
         'min_temp_rating': min_temp_rating,
         'max_temp_rating': max_temp_rating,
         'wind_rating': wind_rating,
-        'condition_ok': condition_ok
+        'condition_ok': condition_ok,
+        'alerts': period_alerts
     }
     
-    evaluation['flamingo_rating'] = calculate_flamingo_rating(evaluation)
+    rating = lookup_flamingo_rating(min_temp_rating, max_temp_rating, wind_rating, condition_ok)
+    evaluation['flamingo_rating'] = apply_alert_override(rating, period_alerts)
     evaluation['is_great'] = evaluation['flamingo_rating'] == 5
     
     return evaluation
 
-def evaluate_day_reason(day_period, criteria):
+def evaluate_day_reason(day_period, criteria, alerts=None, tables=None):
     """Return a reason string for the evaluation of the day_period based on criteria."""
     try:
         temp = int(float(day_period['temperature']))
         wind_speed = parse_wind_speed(day_period['windSpeed'])
-        min_temp_rating = evaluate_min_temperature(temp, criteria['min_temp'])
-        max_temp_rating = evaluate_max_temperature(temp, criteria['max_temp'])
-        wind_rating = evaluate_wind_speed(wind_speed, criteria['max_wind'])
+        min_temp_rating, max_temp_rating, wind_rating = lookup_ratings(temp, wind_speed, tables or rating_tables(criteria))
     except Exception as e:
         return "Error parsing weather data."
     
@@ -396,8 +1256,21 @@ def evaluate_day_reason(day_period, criteria):
         reasons.append(f"wind speed is slightly high ({wind_speed} mph, within 5 mph of maximum {criteria['max_wind']} mph, -1 flamingo)")
     
     # Condition reasons
-    if not is_acceptable_condition(day_period['shortForecast'], criteria['required_condition']):
-        reasons.append(f"forecast is not acceptable (got '{day_period['shortForecast']}')")
+    if not is_acceptable_period(day_period, criteria['required_condition']):
+        details = [f"'{day_period['shortForecast']}'"]
+        if day_period.get('skyCover') is not None:
+            details.append(f"{day_period['skyCover']}% sky cover")
+        if day_period.get('probabilityOfPrecipitation') is not None:
+            details.append(f"{day_period['probabilityOfPrecipitation']}% chance of precipitation")
+        reasons.append(f"forecast is not acceptable (got {', '.join(details)})")
+    
+    # Alert reasons
+    for alert in alerts_for_period(alerts, day_period):
+        cap = ALERT_RATING_CAPS.get(alert['event'])
+        if cap == 0:
+            reasons.append(f"{alert['event']} in effect (not suitable)")
+        elif cap is not None:
+            reasons.append(f"{alert['event']} in effect (at most {cap} flamingo{'s' if cap > 1 else ''})")
     
     return "; ".join(reasons) if reasons else "Perfect sunbathing conditions!"
 
@@ -411,269 +1284,7 @@ HTML_TEMPLATE = r"""
 <!DOCTYPE html>
 <html>
 <head>
-    <style>
-        body {
-            font-family: system-ui, -apple-system, sans-serif;
-            line-height: 1.6;
-            margin: 0;
-            padding: 0;
-            background: #f0f8ff;
-            color: #333;
-        }
-        .container {
-            width: 90%;
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        .header {
-            text-align: center;
-            margin-bottom: 30px;
-            padding: 20px;
-            background: white;
-            border-radius: 10px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }
-        .header h1 {
-            margin: 0;
-            color: #2c5282;
-        }
-        .rating-scale {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 10px;
-            margin: 20px 0;
-            padding: 20px;
-            background: white;
-            border-radius: 10px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }
-        .rating-scale div {
-            padding: 10px;
-            border-radius: 5px;
-            background: #f7fafc;
-        }
-        .form-section {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 20px;
-            margin: 20px 0;
-        }
-        .form-group {
-            background: white;
-            padding: 20px;
-            border-radius: 10px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }
-        .form-group h3 {
-            margin-top: 0;
-            color: #2c5282;
-            border-bottom: 2px solid #e2e8f0;
-            padding-bottom: 10px;
-        }
-        .input-field {
-            width: 100%;
-            padding: 8px;
-            margin: 5px 0 15px 0;
-            border: 1px solid #e2e8f0;
-            border-radius: 5px;
-            font-size: 16px;
-        }
-        .input-label {
-            display: block;
-            margin-top: 10px;
-            color: #4a5568;
-            font-weight: 500;
-        }
-        .temperature-group {
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 15px;
-            margin-bottom: 15px;
-        }
-        .temperature-input {
-            display: flex;
-            flex-direction: column;
-        }
-        .radio-group {
-            display: flex;
-            flex-direction: column;
-            gap: 10px;
-            margin: 10px 0;
-        }
-        .radio-label {
-            display: flex;
-            align-items: center;
-            padding: 8px;
-            border-radius: 5px;
-            background: #f7fafc;
-            cursor: pointer;
-        }
-        .radio-label:hover {
-            background: #edf2f7;
-        }
-        .submit-btn {
-            background-color: #ff69b4;
-            color: white;
-            padding: 12px 24px;
-            border: none;
-            border-radius: 5px;
-            font-size: 16px;
-            cursor: pointer;
-            width: 100%;
-            margin-top: 20px;
-            transition: background-color 0.2s;
-        }
-        .submit-btn:hover {
-            background-color: #ff1493;
-        }
-        .location-results {
-            background: white;
-            padding: 20px;
-            border-radius: 10px;
-            margin: 20px 0;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }
-        .day-card {
-            background: #f7fafc;
-            padding: 20px;
-            margin: 15px 0;
-            border-radius: 8px;
-            display: grid;
-            grid-template-columns: 1fr;
-            gap: 15px;
-        }
-        .card-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding-bottom: 10px;
-            border-bottom: 1px solid #e2e8f0;
-        }
-        .evaluation-section {
-            display: flex;
-            gap: 15px;
-            align-items: flex-start;
-            background: #edf2f7;
-            padding: 12px;
-            border-radius: 5px;
-            margin-top: -5px;
-        }
-        .flamingo-rating {
-            font-size: 2rem;
-            flex-shrink: 0;
-            min-width: 150px;
-            text-align: center;
-        }
-        .evaluation-reason {
-            color: #4a5568;
-            flex-grow: 1;
-            padding-top: 8px;
-        }
-        .weather-details {
-            display: grid;
-            grid-template-columns: repeat(3, 1fr);
-            gap: 15px;
-            padding: 10px 0;
-            margin-top: 5px;
-        }
-        .weather-item {
-            background: white;
-            padding: 10px;
-            border-radius: 5px;
-            text-align: center;
-        }
-        .location-select {
-            cursor: pointer;
-        }
-        .location-select option {
-            padding: 8px;
-        }
-        .rating-legend {
-            background: white;
-            padding: 20px;
-            border-radius: 10px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            margin-bottom: 20px;
-        }
-        
-        .rating-legend h3 {
-            margin-top: 0;
-            color: #2c5282;
-            border-bottom: 2px solid #e2e8f0;
-            padding-bottom: 10px;
-        }
-        
-        .legend-items {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-            gap: 10px;
-            margin-top: 10px;
-        }
-        
-        .legend-items div {
-            padding: 8px;
-            text-align: center;
-            background: #f7fafc;
-            border-radius: 5px;
-            display: flex;
-            flex-direction: column;
-            gap: 5px;
-        }
-        
-        .legend-items .rating-icons {
-            font-size: 1.5rem;
-        }
-        
-        .legend-items .rating-text {
-            font-size: 0.9rem;
-            color: #4a5568;
-        }
-        
-        .loading-overlay {
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(255, 255, 255, 0.9);
-            z-index: 1000;
-            justify-content: center;
-            align-items: center;
-            flex-direction: column;
-            gap: 20px;
-        }
-        
-        .loading-content {
-            background: white;
-            padding: 30px;
-            border-radius: 15px;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-            text-align: center;
-        }
-        
-        .loading-spinner {
-            display: inline-block;
-            width: 50px;
-            height: 50px;
-            border: 5px solid #f3f3f3;
-            border-top: 5px solid #ff69b4;
-            border-radius: 50%;
-            animation: spin 1s linear infinite;
-        }
-        
-        .loading-message {
-            margin-top: 15px;
-            font-size: 18px;
-            color: #2c5282;
-        }
-        
-        @keyframes spin {
-            0% { transform: rotate(0deg); }
-            100% { transform: rotate(360deg); }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
 </head>
 <body>
     <div class="loading-overlay" id="loadingOverlay">
@@ -721,7 +1332,7 @@ HTML_TEMPLATE = r"""
             </div>
         </div>
 
-        <form method="POST" id="weatherForm">
+        <form method="GET" id="weatherForm">
             <div class="form-section">
                 <div class="form-group">
                     <h3>📍 Select Locations</h3>
@@ -767,6 +1378,11 @@ HTML_TEMPLATE = r"""
                 </div>
             </div>
 
+            <label class="compact-option">
+                <input type="checkbox" name="compact" value="1" {% if compact %}checked{% endif %}>
+                <span>Compact results (smaller page, details on demand)</span>
+            </label>
+
             <button type="submit" class="submit-btn">Check Weather Forecast</button>
 
         </form>
@@ -775,7 +1391,23 @@ HTML_TEMPLATE = r"""
             {% for location in results %}
             <div class="location-results">
                 <h2>7 Day Weather and Evaluation for {{ location.name }}</h2>
+                {% if location.unavailable %}
+                <div class="status-banner">⚠️ The weather service is not responding and there is no earlier forecast to show. Please try again in a few minutes.</div>
+                {% elif location.stale_minutes is defined %}
+                <div class="status-banner">⚠️ The weather service is slow or unavailable. Showing the last forecast we received, {{ location.stale_minutes }} minutes ago.</div>
+                {% endif %}
                 {% for day in location.days %}
+                {% if compact %}
+                <div class="day-card compact">
+                    <div class="card-header"><strong>{{ day.date }}</strong><span class="flamingos r{{ day.flamingo_rating }}"></span></div>
+                    <div class="evaluation-reason">{{ day.reason }}</div>
+                    {% for alert in day.alerts %}
+                    <div class="alert-banner">⚠️ {{ alert.headline or alert.event }}</div>
+                    {% endfor %}
+                    <div class="compact-details">{{ get_weather_icon(day.day_period.shortForecast) }} {{ day.day_period.shortForecast }} · 🌡 {{ day.day_period.temperature }}°F · {{ get_wind_icon(day.day_period.windSpeed) }} {{ day.day_period.windSpeed }}</div>
+                    <details class="forecast-details" data-location="{{ location.name }}" data-date="{{ day.date }}"><summary>Detailed forecast</summary><p></p></details>
+                </div>
+                {% else %}
                 <div class="day-card">
                     <div class="card-header">
                         <strong>{{ day.date }}</strong>
@@ -802,6 +1434,10 @@ HTML_TEMPLATE = r"""
                         </div>
                     </div>
                     
+                    {% for alert in day.alerts %}
+                    <div class="alert-banner">⚠️ {{ alert.headline or alert.event }}</div>
+                    {% endfor %}
+                    
                     <div class="weather-details">
                         <div class="weather-item">
                             <div>Conditions</div>
@@ -817,99 +1453,316 @@ HTML_TEMPLATE = r"""
                         </div>
                     </div>
                 </div>
+                {% endif %}
                 {% endfor %}
             </div>
             {% endfor %}
         {% endif %}
     </div>
 
-    <script>
-        // Loading messages to cycle through
-        const loadingMessages = [
-            "Checking if the sun is feeling friendly...",
-            "Counting clouds in the sky...",
-            "Measuring the wind's enthusiasm...",
-            "Consulting with the flamingos...",
-            "Calculating optimal sunbathing angles...",
-            "Evaluating beach weather potential...",
-            "Determining flamingo rating...",
-            "Analyzing sunbathing conditions..."
-        ];
-        
-        let messageIndex = 0;
-        let messageInterval;
-        
-        function cycleLoadingMessage() {
-            const loadingText = document.getElementById('loadingText');
-            loadingText.textContent = loadingMessages[messageIndex];
-            messageIndex = (messageIndex + 1) % loadingMessages.length;
-        }
-        
-        function showLoading() {
-            const overlay = document.getElementById('loadingOverlay');
-            overlay.style.display = 'flex';
-            messageIndex = 0;
-            cycleLoadingMessage();
-            messageInterval = setInterval(cycleLoadingMessage, 2000);
+    <script src="{{ asset_url('app.js') }}"></script>
+</body>
+</html>
+"""
+
+# Serve the page through a loader so Jinja compiles it once and caches it,
+# instead of recompiling the string on every request
+app.jinja_loader = DictLoader({"home.html": HTML_TEMPLATE})
+# Drop the template's block indentation and newlines from the output
+app.jinja_env.trim_blocks = True
+app.jinja_env.lstrip_blocks = True
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_CONTENT_TYPES = {".css": "text/css; charset=utf-8", ".js": "text/javascript; charset=utf-8"}
+
+# Dynamic responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_MIMETYPES = ("text/html", "application/json")
+# Levels for per-response compression; static assets use the maximum once
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+@functools.lru_cache(maxsize=None)
+def _brotli():
+    """The optional brotli module, imported on first use; None if not installed."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    return brotli
+
+def compress(data, encoding, static=False):
+    """Compress a body with 'br' or 'gzip'."""
+    if encoding == "br":
+        return _brotli().compress(data, quality=11 if static else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if static else GZIP_LEVEL, mtime=0)
+
+def negotiate_encoding(accept_encodings):
+    """Pick 'br' (when brotli is installed) or 'gzip' from Accept-Encoding, or None."""
+    if accept_encodings["br"] and _brotli() is not None:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+def response_encoding():
+    """
+    The Content-Encoding for this request's response, negotiated once so the
+    ETag suffix on a 304 is the one its 200 would have had.
+    """
+    if "response_encoding" not in g:
+        g.response_encoding = negotiate_encoding(request.accept_encodings)
+    return g.response_encoding
+
+@functools.lru_cache(maxsize=None)
+def static_assets():
+    """
+    Load the files in static/ once, with precompressed gzip and brotli
+    bodies and a content hash for cache-busting URLs.
+    """
+    assets = {}
+    for name in sorted(os.listdir(STATIC_DIR)):
+        with open(os.path.join(STATIC_DIR, name), "rb") as f:
+            raw = f.read()
+        bodies = {None: raw, "gzip": compress(raw, "gzip", static=True)}
+        if _brotli() is not None:
+            bodies["br"] = compress(raw, "br", static=True)
+        assets[name] = {
+            "bodies": bodies,
+            "version": hashlib.sha256(raw).hexdigest()[:12],
+            "content_type": STATIC_CONTENT_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
         }
-        
-        function hideLoading() {
-            const overlay = document.getElementById('loadingOverlay');
-            overlay.style.display = 'none';
-            clearInterval(messageInterval);
+    return assets
+
+@app.template_global()
+def asset_url(name):
+    return f"/static/{name}?v={static_assets()[name]['version']}"
+
+# Fingerprint of the page markup and assets, so cached pages are invalidated on deploy
+TEMPLATE_VERSION = hashlib.sha256(
+    (HTML_TEMPLATE + "".join(asset["version"] for asset in static_assets().values())).encode()
+).hexdigest()[:12]
+
+def parse_criteria(params):
+    """Read the locations and criteria from form or query parameters."""
+    locations = params.getlist("location")
+    criteria = {
+        "min_temp": int(params.get("min_temp", DEFAULT_SUNBATHING_CRITERIA["min_temp"])),
+        "max_temp": int(params.get("max_temp", DEFAULT_SUNBATHING_CRITERIA["max_temp"])),
+        "max_wind": int(params.get("max_wind", DEFAULT_SUNBATHING_CRITERIA["max_wind"])),
+        "required_condition": params.get("required_condition", DEFAULT_SUNBATHING_CRITERIA["required_condition"])
+    }
+    return locations, criteria
+
+def canonical_query(locations, criteria, compact=False):
+    """
+    The normalized query string for a set of locations and criteria: fixed
+    parameter order with defaults filled in. _worker.js builds the same
+    string for its cache keys.
+    """
+    params = [("location", location) for location in locations]
+    params += [(name, criteria[name]) for name in ("min_temp", "max_temp", "max_wind", "required_condition")]
+    if compact:
+        params.append(("compact", "1"))
+    return urlencode(params)
+
+def _etag_matches(etag):
+    """If-None-Match check that also accepts the compressed variants of an ETag."""
+    return any(request.if_none_match.contains(etag + suffix) for suffix in ("", "-gzip", "-br"))
+
+def load_location(location, criteria, priority="user"):
+    """
+    Gather everything needed to evaluate one location: the forecast entry,
+    active alerts and raw gridpoint layers, plus a version string and expiry
+    time covering all of them. Raises requests.RequestException when there
+    is no forecast at all, not even a stale one.
+    """
+    lat, lon = CITY_COORDINATES[location]
+    forecast_entry = get_forecast_entry(lat, lon, priority)
+    point = get_point_metadata(lat, lon, priority)
+    expires_at = forecast_entry["expires_at"]
+    
+    try:
+        alerts = get_active_alerts(point, priority)
+        expires_at = min(expires_at, _ALERT_CACHE[point["state"]]["fetched_at"] + ALERT_CACHE_TTL)
+    except requests.RequestException as e:
+        print(f"Could not fetch alerts for {location}: {e}")
+        alerts = []
+    except KeyError:
+        # No area to query alerts for
+        pass
+    
+    gridpoint_fetched_at = None
+    try:
+        gridpoint_layers = get_gridpoint_layers(point, gridpoint_layers_for(criteria), priority)
+        if gridpoint_layers:
+            try:
+                gridpoint_fetched_at = _GRIDPOINT_CACHE[point["forecastGridData"]]["fetched_at"]
+            except KeyError:
+                # Evicted (or never admitted) since; version the layers as new
+                gridpoint_fetched_at = time.time()
+            expires_at = min(expires_at, gridpoint_fetched_at + GRIDPOINT_CACHE_TTL)
+    except requests.RequestException as e:
+        print(f"Could not fetch gridpoint data for {location}: {e}")
+        gridpoint_layers = {}
+    
+    forecast_version = forecast_entry["data"]["properties"].get("updateTime") or forecast_entry["fetched_at"]
+    version = f"{forecast_version}|{gridpoint_fetched_at}|{','.join(sorted(alert['id'] for alert in alerts))}"
+    return {
+        "name": location,
+        "forecast": forecast_entry,
+        "alerts": alerts,
+        "gridpoint_layers": gridpoint_layers,
+        "gridpoint_fetched_at": gridpoint_fetched_at,
+        "version": version,
+        "expires_at": expires_at
+    }
+
+# Day evaluations per (location, criteria), so a forecast refresh only
+# rescores the days whose forecast period changed:
+# {key: {"version": inputs version, "context": (gridpoint fetch time, alert ids),
+#        "days": {startTime: (raw forecast period, day)}, "best_days": [date]}}
+_EVALUATION_CACHE = BoundedCache("evaluations", _cache_budget("evaluations"))
+# Approximate memory per evaluated day, to size entries without walking them
+EVALUATED_DAY_SIZE = 2500
+_EVALUATION_STATS = {"locations_reused": 0, "days_reused": 0, "days_rescored": 0}
+
+def _daytime_periods(forecast_data):
+    """The raw Day period of each date with one, in order: {date: period}."""
+    periods = {}
+    for day in parse_next_7_days(forecast_data):
+        for label, period in day["periods"]:
+            if label == "Day":
+                periods[day["date"]] = period
+    return periods
+
+def rank_best_days(days):
+    """Dates ordered from best to worst flamingo rating, earliest first on ties."""
+    return [day["date"] for day in sorted(days, key=lambda day: -day["flamingo_rating"])]
+
+def evaluate_location(inputs, criteria):
+    """
+    Rate each day of a location loaded with load_location against the
+    criteria. When the inputs version is unchanged nothing is rescored; when
+    only the forecast changed, days whose raw forecast period is unchanged
+    are reused without parsing them or summarizing gridpoints over them.
+    """
+    forecast_entry = inputs["forecast"]
+    alerts = inputs["alerts"]
+    key = (inputs["name"], tuple(sorted(criteria.items())))
+    cached = _EVALUATION_CACHE.get(key)
+    
+    if cached is not None and cached["version"] == inputs["version"]:
+        _EVALUATION_STATS["locations_reused"] += 1
+        location_results = {
+            "name": inputs["name"],
+            "days": [day for _, day in cached["days"].values()],
+            "best_days": cached["best_days"]
         }
-        
-        // Function to handle double-click on location options
-        function handleLocationDoubleClick(e) {
-            // Prevent the default double-click behavior
-            e.preventDefault();
+    else:
+        # Gridpoint summaries and alerts can change any day, so when either
+        # changed every day is rescored
+        context = (inputs["gridpoint_fetched_at"], tuple(sorted(alert["id"] for alert in alerts)))
+        previous_days = cached["days"] if cached is not None and cached["context"] == context else {}
+        evaluated_days = {}
+        changed = cached is None
+        tables = rating_tables(criteria)
+        for date, raw_period in _daytime_periods(forecast_entry["data"]).items():
+            previous = previous_days.get(raw_period["startTime"])
+            if previous is not None and previous[0] == raw_period:
+                _EVALUATION_STATS["days_reused"] += 1
+                evaluated_days[raw_period["startTime"]] = previous
+                continue
             
-            if (e.target.tagName === 'OPTION') {
-                // Clear other selections
-                const options = e.target.parentElement.options;
-                for (let i = 0; i < options.length; i++) {
-                    options[i].selected = options[i] === e.target;
-                }
-                
-                // Show loading and submit form
-                showLoading();
-                document.getElementById('weatherForm').submit();
-            }
-        }
-
-        // Function to initialize event listeners
-        function initializeEventListeners() {
-            const locationSelect = document.getElementById('location');
-            if (locationSelect) {
-                // Remove existing listener to prevent duplicates
-                locationSelect.removeEventListener('dblclick', handleLocationDoubleClick);
-                // Add the event listener
-                locationSelect.addEventListener('dblclick', handleLocationDoubleClick);
-            }
+            day_period = attach_gridpoint_data(simplify_period(raw_period), inputs["gridpoint_layers"])
+            # Convert temperature to integer
+            day_period['temperature'] = int(float(day_period['temperature']))
+            # Convert wind speed to integer
+            day_period['windSpeed'] = f"{parse_wind_speed(day_period['windSpeed'])} mph"
             
-            // Add submit handler to the form
-            const form = document.getElementById('weatherForm');
-            if (form) {
-                form.addEventListener('submit', function(e) {
-                    showLoading();
-                });
-            }
-        }
+            _EVALUATION_STATS["days_rescored"] += 1
+            changed = True
+            evaluation = is_great_sunbathing_day(day_period, criteria, alerts, tables)
+            reason = evaluate_day_reason(day_period, criteria, alerts, tables)
+            evaluated_days[raw_period["startTime"]] = (raw_period, {
+                "date": date,
+                "is_great": evaluation['is_great'],
+                "reason": reason,
+                "day_period": day_period,
+                "min_temp_rating": evaluation['min_temp_rating'],
+                "max_temp_rating": evaluation['max_temp_rating'],
+                "wind_ok": evaluation['wind_rating'],
+                "condition_ok": evaluation['condition_ok'],
+                "flamingo_rating": evaluation['flamingo_rating'],
+                "alerts": evaluation['alerts']
+            })
+        
+        days = [day for _, day in evaluated_days.values()]
+        # The ranking only depends on the days, so it's redone only when one changed
+        changed = changed or evaluated_days.keys() != previous_days.keys()
+        if changed:
+            best_days = rank_best_days(days)
+            _EVALUATION_CACHE.set(key, {
+                "version": inputs["version"],
+                "context": context,
+                "days": evaluated_days,
+                "best_days": best_days
+            }, size=len(evaluated_days) * EVALUATED_DAY_SIZE)
+        else:
+            # Same days as before: record the new version, nothing to rewrite
+            best_days = cached["best_days"]
+            cached["version"] = inputs["version"]
+            cached["context"] = context
+        location_results = {"name": inputs["name"], "days": days, "best_days": best_days}
+    
+    if forecast_entry["stale"]:
+        location_results["stale_minutes"] = stale_minutes(forecast_entry)
+    return location_results
 
-        // Initialize on page load
-        initializeEventListeners();
+def stale_minutes(forecast_entry):
+    """How old a stale forecast is, as shown on the page."""
+    return int((time.time() - forecast_entry["fetched_at"]) // 60)
 
-        // Initialize after form submission (in case of partial page updates)
-        document.addEventListener('DOMContentLoaded', initializeEventListeners);
-    </script>
-</body>
-</html>
-"""
+def evaluation_cache_state():
+    """Counters for /metrics: how much of each evaluation was reused."""
+    return dict(_EVALUATION_STATS)
+
+# Longest a page may be cached while it shows stale or missing forecasts
+DEGRADED_MAX_AGE = 30
+# Cache lifetime of the empty form page
+FORM_MAX_AGE = 300
+
+def results_cache_headers(locations, criteria, loaded, variant=""):
+    """
+    Return (etag, max_age) for a results page: a strong ETag over the page
+    markup, criteria, the version of every location's inputs and the age of
+    stale forecasts, and a max-age that ends when the first of those inputs
+    expires.
+    """
+    parts = [TEMPLATE_VERSION, variant, json.dumps(criteria, sort_keys=True)]
+    max_age = None
+    for location in locations:
+        inputs = loaded.get(location)
+        if inputs is None:
+            parts.append(f"{location}:unavailable")
+            max_age = min(max_age if max_age is not None else DEGRADED_MAX_AGE, DEGRADED_MAX_AGE)
+            continue
+        parts.append(f"{location}:{inputs['version']}")
+        location_max_age = max(0, int(inputs["expires_at"] - time.time()))
+        if inputs["forecast"]["stale"]:
+            # The page shows the forecast's age, so each minute is a new body
+            parts.append(f"stale:{stale_minutes(inputs['forecast'])}")
+            location_max_age = min(location_max_age, DEGRADED_MAX_AGE)
+        max_age = location_max_age if max_age is None else min(max_age, location_max_age)
+    etag = hashlib.sha256("\n".join(parts).encode()).hexdigest()[:32]
+    return etag, max_age or 0
 
 @app.route("/", methods=["GET", "POST"])
 def home():
     message = None
     results = None
+    etag = None
+    max_age = None
     form_data = {
         "min_temp": DEFAULT_SUNBATHING_CRITERIA["min_temp"],
         "max_temp": DEFAULT_SUNBATHING_CRITERIA["max_temp"],
@@ -917,90 +1770,385 @@ def home():
         "required_condition": DEFAULT_SUNBATHING_CRITERIA["required_condition"],
         "locations": []
     }
+    # GET /?location=...&min_temp=... is the cacheable form of the query
+    params = request.form if request.method == "POST" else request.args
+    # Compact mode renders lighter day cards and loads detailed text on demand
+    compact = params.get("compact") == "1"
 
-    if request.method == "POST":
+    if request.method == "POST" or "location" in params:
         try:
-            locations = request.form.getlist("location")
-            min_temp = int(request.form.get("min_temp", DEFAULT_SUNBATHING_CRITERIA["min_temp"]))
-            max_temp = int(request.form.get("max_temp", DEFAULT_SUNBATHING_CRITERIA["max_temp"]))
-            max_wind = int(request.form.get("max_wind", DEFAULT_SUNBATHING_CRITERIA["max_wind"]))
-            required_condition = request.form.get("required_condition", DEFAULT_SUNBATHING_CRITERIA["required_condition"])
-
-            form_data = {
-                "min_temp": min_temp,
-                "max_temp": max_temp,
-                "max_wind": max_wind,
-                "required_condition": required_condition,
-                "locations": locations
-            }
+            locations, criteria = parse_criteria(params)
+            form_data = dict(criteria, locations=locations)
 
             if not locations:
                 message = "Please select at least one location."
             else:
-                results = []
+                loaded = {}
                 for location in locations:
                     if location in CITY_COORDINATES:
-                        lat, lon = CITY_COORDINATES[location]
-                        forecast_data = get_forecast(lat, lon)
-                        parsed_days = parse_next_7_days(forecast_data)
-                        location_results = {"name": location, "days": []}
-                        
-                        for day in parsed_days:
-                            day_period = None
-                            for label, period in day.get("periods", []):
-                                if label == "Day":
-                                    day_period = period
-                            if day_period:
-                                # Convert temperature to integer
-                                day_period['temperature'] = int(float(day_period['temperature']))
-                                # Convert wind speed to integer
-                                day_period['windSpeed'] = f"{parse_wind_speed(day_period['windSpeed'])} mph"
-                                
-                                evaluation = is_great_sunbathing_day(day_period, {
-                                    "min_temp": min_temp,
-                                    "max_temp": max_temp,
-                                    "max_wind": max_wind,
-                                    "required_condition": required_condition
-                                })
-                                reason = evaluate_day_reason(day_period, {
-                                    "min_temp": min_temp,
-                                    "max_temp": max_temp,
-                                    "max_wind": max_wind,
-                                    "required_condition": required_condition
-                                })
-                                location_results["days"].append({
-                                    "date": day.get("date"),
-                                    "is_great": evaluation['is_great'],
-                                    "reason": reason,
-                                    "day_period": day_period,
-                                    "min_temp_rating": evaluation['min_temp_rating'],
-                                    "max_temp_rating": evaluation['max_temp_rating'],
-                                    "wind_ok": evaluation['wind_rating'],
-                                    "condition_ok": evaluation['condition_ok'],
-                                    "flamingo_rating": evaluation['flamingo_rating']
-                                })
-                        
+                        try:
+                            loaded[location] = load_location(location, criteria)
+                        except requests.RequestException as e:
+                            # No forecast to fall back on; keep the other locations
+                            print(f"Could not fetch forecast for {location}: {e}")
+                
+                if request.method != "POST":  # GET, or HEAD answered the same way
+                    query = canonical_query(locations, criteria, compact)
+                    if request.query_string.decode() != query:
+                        # One URL per query, so edge and browser caches don't fragment.
+                        # Not a 301: browsers keep those forever, with today's defaults
+                        # filled into the target.
+                        return redirect(f"{request.path}?{query}", code=302)
+                    etag, max_age = results_cache_headers(locations, criteria, loaded, "compact" if compact else "")
+                    if _etag_matches(etag):
+                        response = app.response_class(status=304)
+                        return _with_cache_headers(response, etag, max_age, locations)
+                
+                results = []
+                for location in locations:
+                    if location in loaded:
+                        location_results = evaluate_location(loaded[location], criteria)
                         if location_results["days"]:
                             results.append(location_results)
                             message = "7-day forecast evaluated."
                         else:
                             message = "No valid day periods found."
+                    elif location in CITY_COORDINATES:
+                        results.append({"name": location, "days": [], "unavailable": True})
                     else:
                         message = "City not recognized."
         except ValueError as e:
             message = "Please enter valid numbers for temperature and wind speed."
+            etag = None
         except Exception as e:
             message = f"An error occurred: {str(e)}"
+            etag = None
+    elif request.method != "POST":
+        etag, max_age = f"form-{TEMPLATE_VERSION}", FORM_MAX_AGE
+        if _etag_matches(etag):
+            return _with_cache_headers(app.response_class(status=304), etag, max_age)
     
-    return render_template_string(
-        HTML_TEMPLATE,
+    response = app.make_response(render_template(
+        "home.html",
         message=message,
         results=results,
         cities=MAIN_CITIES,
         form_data=form_data,
+        compact=compact,
         get_weather_icon=get_weather_icon,
         get_wind_icon=get_wind_icon
-    )
+    ))
+    if etag is not None:
+        _with_cache_headers(response, etag, max_age, form_data["locations"])
+    return response
+
+def _with_cache_headers(response, etag, max_age, locations=()):
+    # Each encoding is a different representation, so it gets its own strong
+    # ETag; compress_response encodes the body to match
+    encoding = response_encoding()
+    response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.vary.add("Accept-Encoding")
+    # Surrogate keys so a location's forecast refresh purges only its pages
+    tags = [location_tag(location) for location in locations if location in CITY_COORDINATES]
+    if tags:
+        response.headers["Cache-Tag"] = ",".join(tags)
+    return response
+
+def summarize_day(day):
+    """The JSON form of one evaluated day, as served by /api/forecast."""
+    return {
+        "date": day["date"],
+        "flamingo_rating": day["flamingo_rating"],
+        "is_great": day["is_great"],
+        "reason": day["reason"],
+        "shortForecast": day["day_period"]["shortForecast"],
+        "detailedForecast": day["day_period"]["detailedForecast"],
+        "temperature": day["day_period"]["temperature"],
+        "windSpeed": day["day_period"]["windSpeed"],
+        "alerts": [alert["event"] for alert in day["alerts"]]
+    }
+
+@app.route("/api/forecast")
+def forecast_api():
+    """
+    JSON form of the results page, cacheable on the same terms:
+    /api/forecast?location=Miami, FL&min_temp=72&max_temp=85&max_wind=10&required_condition=clouds
+    """
+    try:
+        locations, criteria = parse_criteria(request.args)
+    except ValueError:
+        return jsonify({"error": "Please enter valid numbers for temperature and wind speed."}), 400
+    locations = [location for location in locations if location in CITY_COORDINATES]
+    if not locations:
+        return jsonify({"error": "Please select at least one known location."}), 400
+    query = canonical_query(locations, criteria)
+    if request.query_string.decode() != query:
+        return redirect(f"{request.path}?{query}", code=302)
+    
+    loaded = {}
+    for location in locations:
+        try:
+            loaded[location] = load_location(location, criteria)
+        except requests.RequestException as e:
+            print(f"Could not fetch forecast for {location}: {e}")
+    etag, max_age = results_cache_headers(locations, criteria, loaded, "json")
+    if _etag_matches(etag):
+        return _with_cache_headers(app.response_class(status=304), etag, max_age, locations)
+    
+    results = []
+    for location in locations:
+        if location not in loaded:
+            results.append({"name": location, "unavailable": True, "days": []})
+            continue
+        location_results = evaluate_location(loaded[location], criteria)
+        results.append({
+            "name": location,
+            "stale_minutes": location_results.get("stale_minutes"),
+            "best_days": location_results["best_days"],
+            "days": [summarize_day(day) for day in location_results["days"]]
+        })
+    response = jsonify({"criteria": criteria, "locations": results})
+    return _with_cache_headers(response, etag, max_age, locations)
+
+def client_address():
+    if CLIENT_IP_HEADER and request.headers.get(CLIENT_IP_HEADER):
+        return request.headers[CLIENT_IP_HEADER]
+    return request.remote_addr
+
+@app.route("/subscribe", methods=["POST"])
+def subscribe():
+    """
+    Register for a notification when a location reaches a flamingo rating:
+    location, min_rating, the usual criteria, and optionally an https webhook
+    URL. Returns each subscription's id and the token to unsubscribe with.
+    """
+    import subscriptions  # Imports this module, so not at the top
+
+    # Fixed messages rather than int()'s, which would echo the raw input
+    try:
+        locations, criteria = parse_criteria(request.form)
+    except ValueError:
+        return jsonify({"error": "Please enter valid numbers for temperature and wind speed."}), 400
+    try:
+        min_rating = int(request.form.get("min_rating", 5))
+    except ValueError:
+        return jsonify({"error": "Please give min_rating as a number from 1 to 5."}), 400
+    if not locations:
+        return jsonify({"error": "Please select at least one location."}), 400
+    # Checked up front; everything else add_subscription rejects fails on the first one
+    unknown = [location for location in locations if location not in CITY_COORDINATES]
+    if unknown:
+        return jsonify({"error": f"Unknown location: {unknown[0]}"}), 400
+    try:
+        webhook = request.form.get("webhook")
+        sink, target = ("webhook", webhook) if webhook else ("outbox", None)
+        client = client_address()
+        db = subscriptions.connect()
+        try:
+            subscriptions.check_client_limits(db, client, len(locations))
+            added = [
+                subscriptions.add_subscription(db, location, criteria, min_rating, sink, target, client)
+                for location in locations
+            ]
+        finally:
+            db.close()
+    except subscriptions.SubscriptionLimitExceeded as e:
+        return jsonify({"error": str(e)}), 429
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"subscriptions": [{"id": id, "token": token} for id, token in added]}), 201
+
+@app.route("/unsubscribe", methods=["POST"])
+def unsubscribe():
+    """Remove a subscription, given the id and token /subscribe returned."""
+    import subscriptions
+
+    try:
+        subscription_id = int(request.form.get("id", ""))
+    except ValueError:
+        return jsonify({"error": "Please give a subscription id."}), 400
+    db = subscriptions.connect()
+    try:
+        removed = subscriptions.remove_subscription(db, subscription_id, request.form.get("token", ""))
+    finally:
+        db.close()
+    if not removed:
+        return jsonify({"error": "No subscription with that id and token."}), 404
+    return jsonify({"removed": subscription_id})
+
+@app.route("/static/<path:filename>")
+def static_asset(filename):
+    """Serve a static asset, precompressed, cached for a year when versioned."""
+    asset = static_assets().get(filename)
+    if asset is None:
+        return app.response_class("Not Found", status=404)
+    encoding = response_encoding()
+    if encoding not in asset["bodies"]:
+        encoding = None
+    etag = asset["version"] + (f"-{encoding}" if encoding else "")
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(asset["bodies"][encoding], content_type=asset["content_type"])
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.cache_control.public = True
+    if request.args.get("v") == asset["version"]:
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = FORM_MAX_AGE
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.before_request
+def limit_nws_time():
+    set_nws_deadline(NWS_REQUEST_BUDGET)
+
+@app.teardown_request
+def lift_nws_time_limit(exc=None):
+    set_nws_deadline(None)
+
+@app.after_request
+def compress_response(response):
+    """Compress HTML and JSON responses when the client accepts it."""
+    if (response.status_code != 200 or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    encoding = response_encoding()
+    if encoding is None:
+        return response
+    data = response.get_data()
+    # A body whose ETag already names the encoding is compressed however small
+    etag, weak = response.get_etag()
+    tagged = etag is not None and not weak and etag.endswith(f"-{encoding}")
+    if len(data) < COMPRESS_MIN_SIZE and not tagged:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.route("/metrics")
+def metrics():
+    """Per-worker diagnostics: NWS request budget, circuit breaker, evaluation reuse and caches."""
+    return jsonify({
+        "nws_rate_limiter": rate_limiter_state(),
+        "nws_circuit": circuit_state(),
+        "evaluation": evaluation_cache_state(),
+        "caches": cache_stats()
+    })
+
+def save_cache_snapshot(path=None):
+    """Write the grid point, forecast and gridpoint layer caches to CACHE_SNAPSHOT_FILE."""
+    path = path or CACHE_SNAPSHOT_FILE
+    snapshot = {
+        "saved_at": time.time(),
+        "points": [[lat, lon, point] for (lat, lon), point in _POINTS_CACHE.items()],
+        "forecasts": dict(_FORECAST_CACHE.items()),
+        "gridpoints": {
+            url: {
+                "fetched_at": entry["fetched_at"],
+                "layers": {name: layer.to_dict() for name, layer in entry["layers"].items()}
+            }
+            for url, entry in _GRIDPOINT_CACHE.items()
+        }
+    }
+    try:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+        print(f"Saved cache snapshot to {path} ({len(_POINTS_CACHE)} points, {len(_FORECAST_CACHE)} forecasts)")
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Could not save cache snapshot: {e}")
+
+def restore_cache_snapshot(path=None):
+    """
+    Load a snapshot written by save_cache_snapshot. Forecasts past their
+    expiry are kept so they can still be served as stale while NWS is down.
+    """
+    path = path or CACHE_SNAPSHOT_FILE
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return 0
+    except (OSError, ValueError) as e:
+        print(f"Could not restore cache snapshot: {e}")
+        return 0
+    
+    for lat, lon, point in snapshot.get("points", []):
+        _POINTS_CACHE.setdefault((lat, lon), point)
+    restored = 0
+    for url, entry in snapshot.get("forecasts", {}).items():
+        if time.time() - entry["fetched_at"] <= FORECAST_STALE_MAX_AGE and url not in _FORECAST_CACHE:
+            _FORECAST_CACHE[url] = entry
+            restored += 1
+    for url, entry in snapshot.get("gridpoints", {}).items():
+        if url not in _GRIDPOINT_CACHE:
+            _GRIDPOINT_CACHE[url] = {
+                "fetched_at": entry["fetched_at"],
+                "layers": {name: GridpointLayer.from_dict(layer) for name, layer in entry["layers"].items()}
+            }
+    return restored
+
+def warmup():
+    """
+    Get a worker ready before it takes traffic: restore the cache snapshot,
+    resolve grid points for every city, prefetch active alerts, import the
+    JSON decoders and compile the page template. Returns the time spent per
+    phase in seconds.
+    """
+    timings = {}
+    
+    start = time.monotonic()
+    restored = restore_cache_snapshot()
+    timings["restore_snapshot"] = time.monotonic() - start
+    
+    # Bounds the NWS phases as a whole, including a call that hangs
+    set_nws_deadline(WARMUP_BUDGET)
+    try:
+        start = time.monotonic()
+        for lat, lon in CITY_COORDINATES.values():
+            if time.monotonic() - start > WARMUP_BUDGET:
+                print("Warmup budget exhausted, remaining grid points resolve on demand")
+                break
+            try:
+                # Startup is on the path to serving users, so not "background"
+                get_point_metadata(lat, lon)
+            except requests.RequestException as e:
+                print(f"Could not resolve grid point for {lat}, {lon}: {e}")
+        timings["resolve_gridpoints"] = time.monotonic() - start
+        
+        # One bulk alert query per area covers every city
+        start = time.monotonic()
+        areas = {point["state"]: point for point in list(_POINTS_CACHE.values()) if point.get("state")}
+        for point in areas.values():
+            try:
+                get_active_alerts(point)
+            except requests.RequestException as e:
+                print(f"Could not prefetch alerts for {point['state']}: {e}")
+        timings["prefetch_alerts"] = time.monotonic() - start
+    finally:
+        set_nws_deadline(None)
+    
+    start = time.monotonic()
+    _json_decoders()
+    timings["import_decoders"] = time.monotonic() - start
+    
+    start = time.monotonic()
+    app.jinja_env.get_template("home.html")
+    timings["compile_template"] = time.monotonic() - start
+    
+    print(f"Warmup done ({restored} forecasts restored): " + ", ".join(f"{phase} {seconds * 1000:.1f}ms" for phase, seconds in timings.items()))
+    return timings
 
 if __name__ == "__main__":
+    warmup()
+    atexit.register(save_cache_snapshot)
     app.run(debug=True, port=5001)
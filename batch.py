@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Batch evaluator: rate many locations and criteria sets outside the web app.
+
+Reads queries from a CSV file (with a header row) or JSONL, one per row:
+location, and optionally id, min_temp, max_temp, max_wind and
+required_condition (missing criteria get the web form's defaults). Forecasts
+come through the app's caches from NWS, or with --archive from a directory
+of recorded NWS responses (the nws_emulator fixture format, recorded with
+`nws_emulator.py --record`). Queries are scored across a process pool with
+the same code as /api/forecast, so results match the web UI.
+
+Results are streamed to JSONL, or to a directory of Parquet files with
+--format parquet (requires pyarrow). Rows already in the output are skipped,
+so an interrupted run can be resumed by running the same command again.
+
+Usage:
+    python batch.py queries.csv -o results.jsonl [--archive fixtures/nws] [--workers 8]
+    python batch.py queries.jsonl -o results/ --format parquet
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import requests
+from werkzeug.datastructures import MultiDict
+
+# Queries per pool task; a task loads its location's forecast once
+TASK_SIZE = 200
+
+def read_queries(path):
+    """Yield input rows as dicts, from JSONL (.jsonl/.ndjson) or CSV."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def parse_query(row):
+    """Return (key, location, criteria) for an input row, read the way the web form is."""
+    import app
+
+    params = MultiDict({name: value for name, value in row.items() if value not in (None, "")})
+    locations, criteria = app.parse_criteria(params)
+    if len(locations) != 1:
+        raise ValueError("each row needs exactly one location")
+    key = str(row["id"]) if row.get("id") not in (None, "") else app.canonical_query(locations, criteria)
+    return key, locations[0], criteria
+
+def evaluate_queries(location, queries):
+    """
+    Pool task: evaluate [(key, criteria)] for one location. Returns
+    (results, failures), failures being [(key, error)].
+    """
+    import app
+
+    results = []
+    failures = []
+    for key, criteria in queries:
+        try:
+            # Cached after the first query, so one fetch per location
+            inputs = app.load_location(location, criteria, "background")
+        except requests.RequestException as e:
+            failures.append((key, str(e)))
+            continue
+        location_results = app.evaluate_location(inputs, criteria)
+        results.append({
+            "key": key,
+            "location": location,
+            "criteria": criteria,
+            "stale_minutes": location_results.get("stale_minutes"),
+            "best_days": location_results["best_days"],
+            "days": [app.summarize_day(day) for day in location_results["days"]]
+        })
+    return results, failures
+
+class JSONLWriter:
+    def __init__(self, path):
+        self.path = path
+
+    def done_keys(self):
+        keys = set()
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        keys.add(json.loads(line)["key"])
+                    except (ValueError, KeyError):
+                        # A partial last line from an interrupted run
+                        pass
+        return keys
+
+    def truncate_partial_line(self):
+        """Cut a partial last line left by an interrupted run, so appends start on a new line."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                step = min(65536, position)
+                f.seek(position - step)
+                newline = f.read(step).rfind(b"\n")
+                if newline != -1:
+                    position += newline + 1 - step
+                    break
+                position -= step
+            if position != end:
+                f.truncate(position)
+
+    def __enter__(self):
+        self.truncate_partial_line()
+        self.f = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def write(self, results):
+        for result in results:
+            self.f.write(json.dumps(result) + "\n")
+        self.f.flush()
+
+    def __exit__(self, *exc):
+        self.f.close()
+
+class ParquetWriter:
+    """Writes one part file per run into the output directory."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+
+        self.path = path
+        self.schema = pa.schema([
+            ("key", pa.string()),
+            ("location", pa.string()),
+            ("criteria", pa.struct([
+                ("min_temp", pa.int64()),
+                ("max_temp", pa.int64()),
+                ("max_wind", pa.int64()),
+                ("required_condition", pa.string())
+            ])),
+            ("stale_minutes", pa.int64()),
+            ("best_days", pa.list_(pa.string())),
+            ("days", pa.list_(pa.struct([
+                ("date", pa.string()),
+                ("flamingo_rating", pa.int64()),
+                ("is_great", pa.bool_()),
+                ("reason", pa.string()),
+                ("shortForecast", pa.string()),
+                ("detailedForecast", pa.string()),
+                ("temperature", pa.int64()),
+                ("windSpeed", pa.string()),
+                ("alerts", pa.list_(pa.string()))
+            ])))
+        ])
+
+    def done_keys(self):
+        import pyarrow.parquet as pq
+
+        keys = set()
+        if os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                if name.endswith(".parquet"):
+                    keys.update(pq.read_table(os.path.join(self.path, name), columns=["key"])["key"].to_pylist())
+        return keys
+
+    def __enter__(self):
+        import pyarrow.parquet as pq
+
+        os.makedirs(self.path, exist_ok=True)
+        # Written under a temporary name and renamed on close, so an
+        # interrupted run leaves no unreadable part behind
+        self.part = os.path.join(self.path, f"part-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}.parquet")
+        self.writer = pq.ParquetWriter(self.part + ".tmp", self.schema)
+        return self
+
+    def write(self, results):
+        import pyarrow as pa
+
+        if results:
+            self.writer.write_table(pa.Table.from_pylist(results, schema=self.schema))
+
+    def __exit__(self, *exc):
+        self.writer.close()
+        os.replace(self.part + ".tmp", self.part)
+
+class Progress:
+    """Progress line on stderr, at most once per second."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.start = time.monotonic()
+        self.reported_at = 0
+
+    def update(self, done, failed, final=False):
+        self.done += done
+        self.failed += failed
+        now = time.monotonic()
+        if final or now - self.reported_at >= 1:
+            self.reported_at = now
+            rate = self.done / max(now - self.start, 1e-9)
+            print(f"\r{self.done + self.failed}/{self.total} queries, {self.failed} failed, {rate:.0f}/s",
+                  end="\n" if final else "", file=sys.stderr, flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate sunbathing queries in bulk.")
+    parser.add_argument("input", help="CSV or JSONL file of queries")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file, or directory for --format parquet")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--archive", help="Directory of recorded NWS responses to use instead of NWS")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    server = None
+    if args.archive:
+        import nws_emulator
+
+        # Serve the archive locally; nothing is synthesized, and the NWS
+        # request budget doesn't apply
+        server = nws_emulator.start_emulator(fixtures_dir=args.archive, synthesize=False, quiet=True)
+        os.environ["NWS_API_BASE"] = server.base_url
+        os.environ["NWS_RATE_LIMIT"] = "100000"
+        os.environ["NWS_RATE_BURST"] = "100000"
+        os.environ["NWS_RATE_LIMIT_FILE"] = os.path.join(tempfile.mkdtemp(), "nws_bucket")
+
+    # Imported after the environment is set up, so pool workers inherit it
+    import app
+
+    writer = ParquetWriter(args.output) if args.format == "parquet" else JSONLWriter(args.output)
+    done = writer.done_keys()
+
+    by_location = {}
+    skipped = 0
+    invalid = 0
+    for number, row in enumerate(read_queries(args.input), 1):
+        try:
+            key, location, criteria = parse_query(row)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Skipping row {number}: {e}", file=sys.stderr)
+            invalid += 1
+            continue
+        if location not in app.CITY_COORDINATES:
+            print(f"Skipping row {number}: unknown location {location}", file=sys.stderr)
+            invalid += 1
+            continue
+        if key in done:
+            skipped += 1
+            continue
+        done.add(key)
+        by_location.setdefault(location, []).append((key, criteria))
+    total = sum(len(queries) for queries in by_location.values())
+    print(f"{total} queries to evaluate ({skipped} already done, {invalid} invalid)", file=sys.stderr)
+    if not total:
+        if server is not None:
+            server.shutdown()
+        return
+
+    tasks = [
+        (location, queries[i:i + TASK_SIZE])
+        for location, queries in by_location.items()
+        for i in range(0, len(queries), TASK_SIZE)
+    ]
+    progress = Progress(total)
+    with writer, ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(evaluate_queries, location, queries) for location, queries in tasks]
+        for future in as_completed(futures):
+            results, failures = future.result()
+            writer.write(results)
+            for key, error in failures:
+                print(f"\nFailed {key}: {error}", file=sys.stderr)
+            progress.update(len(results), len(failures))
+    progress.update(0, 0, final=True)
+
+    if server is not None:
+        server.shutdown()
+    # Failed queries aren't written, so a rerun retries them
+    sys.exit(1 if progress.failed else 0)
+
+if __name__ == "__main__":
+    main()
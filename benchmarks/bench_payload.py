@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Payload benchmark: bytes per results page (all cities) in full and compact
+mode, uncompressed vs gzip/brotli, and the CPU cost of compressing them.
+
+Usage:
+    python benchmarks/bench_payload.py [--repeat 20]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nws_emulator  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    server = nws_emulator.start_emulator(quiet=True)
+    os.environ["NWS_API_BASE"] = server.base_url
+
+    import app
+
+    client = app.app.test_client()
+    criteria = dict(app.DEFAULT_SUNBATHING_CRITERIA)
+    encodings = ["gzip"] + (["br"] if app._brotli() is not None else [])
+
+    print(f"{'page':<10} {'encoding':<9} {'bytes':>9} {'ratio':>7} {'compress ms':>12}")
+    for compact in (False, True):
+        url = "/?" + app.canonical_query(app.MAIN_CITIES, criteria, compact)
+        with contextlib.redirect_stdout(io.StringIO()):
+            body = client.get(url).get_data()
+        name = "compact" if compact else "full"
+        print(f"{name:<10} {'identity':<9} {len(body):>9} {1:>7.1f} {'-':>12}")
+        for encoding in encodings:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                compressed = app.compress(body, encoding)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print(f"{name:<10} {encoding:<9} {len(compressed):>9} {len(body) / len(compressed):>7.1f} {elapsed * 1000:>12.2f}")
+
+    print("\nstatic assets (precompressed once at startup):")
+    for name, asset in app.static_assets().items():
+        sizes = ", ".join(f"{encoding or 'identity'} {len(body)}" for encoding, body in asset["bodies"].items())
+        print(f"  {name}: {sizes}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
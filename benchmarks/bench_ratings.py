@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: table-driven flamingo ratings vs the branchy reference
+implementation (evaluate_* + calculate_flamingo_rating).
+
+Usage:
+    python benchmarks/bench_ratings.py [--samples 100000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+CRITERIA = {"min_temp": 72, "max_temp": 85, "max_wind": 10}
+
+def reference_rating(temp, wind_speed, condition_ok, criteria):
+    return app.calculate_flamingo_rating({
+        'min_temp_rating': app.evaluate_min_temperature(temp, criteria['min_temp']),
+        'max_temp_rating': app.evaluate_max_temperature(temp, criteria['max_temp']),
+        'wind_rating': app.evaluate_wind_speed(wind_speed, criteria['max_wind']),
+        'condition_ok': condition_ok
+    })
+
+def table_rating(temp, wind_speed, condition_ok, tables):
+    return app.lookup_flamingo_rating(*app.lookup_ratings(temp, wind_speed, tables), condition_ok)
+
+def check_equivalence(criteria):
+    """Compare both implementations over the whole table domain."""
+    temp_start, temp_end = app.RATING_TABLE_TEMP_RANGE
+    wind_start, wind_end = app.RATING_TABLE_WIND_RANGE
+    for temp in range(temp_start - 5, temp_end + 6):
+        for wind_speed in range(wind_start, wind_end + 6):
+            for condition_ok in (False, True):
+                expected = reference_rating(temp, wind_speed, condition_ok, criteria)
+                actual = table_rating(temp, wind_speed, condition_ok, app.rating_tables(criteria))
+                if expected != actual:
+                    raise AssertionError(f"Mismatch at temp={temp} wind={wind_speed} ok={condition_ok}: {expected} != {actual}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    check_equivalence(CRITERIA)
+    print("Equivalence check passed over the full table domain.")
+
+    rng = random.Random(42)
+    inputs = [(rng.randint(50, 100), rng.randint(0, 30), rng.random() < 0.8) for _ in range(args.samples)]
+
+    def run(fn, criteria):
+        for temp, wind_speed, condition_ok in inputs:
+            fn(temp, wind_speed, condition_ok, criteria)
+
+    # Tables are resolved once per criteria, as evaluate_location does
+    runs = (
+        ("reference", lambda: run(reference_rating, CRITERIA)),
+        ("tables", lambda: run(table_rating, app.rating_tables(CRITERIA))),
+    )
+    for name, fn in runs:
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print(f"{name:>10}: {best * 1000:8.2f} ms per {args.samples} ratings ({best / args.samples * 1e9:6.0f} ns each)")
+
+if __name__ == "__main__":
+    main()
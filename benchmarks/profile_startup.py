@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Startup profile: import-time breakdown of app.py, warmup phase timings, and
+first vs. steady-state request latency against the local NWS emulator.
+
+Usage:
+    python benchmarks/profile_startup.py [--top 15] [--requests 20]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+def import_breakdown():
+    """Return [(module, cumulative_us)] for the modules app.py imports directly."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    total = 0
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if len(indent) == 1:
+            # Children are listed before their parent: the modules collected
+            # so far belong to this top-level import
+            if name == "app":
+                total = int(cumulative)
+                break
+            modules = []
+        elif len(indent) == 3:
+            # Direct imports are nested one level (two extra spaces)
+            modules.append((name, int(cumulative)))
+    return total, sorted(modules, key=lambda item: item[1], reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    total, modules = import_breakdown()
+    print(f"import app: {total / 1000:.1f}ms")
+    for name, cumulative in modules[:args.top]:
+        print(f"  {name:<20} {cumulative / 1000:8.1f}ms")
+
+    import nws_emulator
+
+    server = nws_emulator.start_emulator(quiet=True)
+    os.environ["NWS_API_BASE"] = server.base_url
+    snapshot = os.path.join(tempfile.mkdtemp(), "cache.json")
+    os.environ["CACHE_SNAPSHOT_FILE"] = snapshot
+
+    import app
+
+    form = {
+        "location": ["Miami, FL", "Naples, FL", "Key West, FL"],
+        "min_temp": "72",
+        "max_temp": "85",
+        "max_wind": "10",
+        "required_condition": "clouds"
+    }
+
+    def timed_request(client):
+        start = time.perf_counter()
+        client.post("/", data=form)
+        return time.perf_counter() - start
+
+    # Cold: no warmup, nothing cached
+    client = app.app.test_client()
+    print(f"\nfirst request, no warmup:   {timed_request(client) * 1000:8.1f}ms")
+    app.save_cache_snapshot()
+
+    # Warm: fresh caches restored from the snapshot by warmup()
+    app._POINTS_CACHE.clear()
+    app._FORECAST_CACHE.clear()
+    app._GRIDPOINT_CACHE.clear()
+    app._ALERT_CACHE.clear()
+    app.app.jinja_env.cache.clear()
+    print("\nwarmup:")
+    for phase, seconds in app.warmup().items():
+        print(f"  {phase:<20} {seconds * 1000:8.1f}ms")
+    print(f"\nfirst request after warmup: {timed_request(client) * 1000:8.1f}ms")
+    steady = sorted(timed_request(client) for _ in range(args.requests))
+    print(f"steady state (median of {args.requests}): {steady[len(steady) // 2] * 1000:8.1f}ms")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Memory-bounded caches for the app's per-worker state.
+
+Each BoundedCache has a byte budget, and evicts with W-TinyLFU: new entries
+go into a small LRU window, and an entry leaving the window only replaces
+the main LRU's eviction victim if it has been requested more often
+recently, according to a count-min sketch. A burst of one-off keys (e.g. unusual criteria combos)
+then cycles through the window without evicting the entries everyone asks
+for.
+
+Entry sizes are measured with approximate_size(), which walks the whole
+value; callers storing large entries often should pass a cheap estimate to
+set() instead.
+"""
+
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+# All caches by name, for stats()
+_CACHES = {}
+
+def approximate_size(obj, _seen=None):
+    """Approximate deep size of an object in bytes (containers, __dict__ and __slots__)."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None), array)):
+        return size
+    if isinstance(obj, dict):
+        size += sum(approximate_size(key, _seen) + approximate_size(value, _seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item, _seen) for item in obj)
+    else:
+        if hasattr(obj, "__dict__"):
+            size += approximate_size(vars(obj), _seen)
+        for name in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, name):
+                size += approximate_size(getattr(obj, name), _seen)
+    return size
+
+class CountMinSketch:
+    """
+    Approximate recent request counts per key, in 4 rows of 4-bit-range
+    counters. All counters are halved every sample_size increments so old
+    popularity fades.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, width=4096):
+        # Power of two, so a hash maps to a column with a mask
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self.rows = [array("B", bytes(self.width)) for _ in range(self.DEPTH)]
+        self.sample_size = 10 * self.width
+        self.additions = 0
+
+    def _columns(self, key):
+        h = hash(key)
+        mask = self.width - 1
+        # A differently seeded multiplicative hash per row
+        return [((h + row * 0x9E3779B97F4A7C15) * 0xBF58476D1CE4E5B9 >> 32) & mask for row in range(self.DEPTH)]
+
+    def add(self, key):
+        for row, column in zip(self.rows, self._columns(key)):
+            if row[column] < self.MAX_COUNT:
+                row[column] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key):
+        return min(row[column] for row, column in zip(self.rows, self._columns(key)))
+
+    def _age(self):
+        for row in self.rows:
+            for column in range(self.width):
+                row[column] >>= 1
+        self.additions //= 2
+
+class BoundedCache:
+    """
+    Dict-like cache limited to max_bytes, with W-TinyLFU eviction and
+    hit/miss/eviction counters. Safe to use from multiple threads.
+    """
+
+    # Share of the budget for the admission window
+    WINDOW_FRACTION = 0.01
+
+    def __init__(self, name, max_bytes, sketch_width=4096):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.window_max_bytes = max(1, int(max_bytes * self.WINDOW_FRACTION))
+        self._window = OrderedDict()  # key -> (value, size)
+        self._main = OrderedDict()
+        self._window_bytes = 0
+        self._main_bytes = 0
+        self._sketch = CountMinSketch(sketch_width)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        _CACHES[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._sketch.add(key)
+            for segment in (self._window, self._main):
+                if key in segment:
+                    segment.move_to_end(key)
+                    self.hits += 1
+                    return segment[key][0]
+            self.misses += 1
+            return default
+
+    def __getitem__(self, key):
+        with self._lock:
+            for segment in (self._window, self._main):
+                if key in segment:
+                    return segment[key][0]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._window or key in self._main
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def set(self, key, value, size=None):
+        """Store an entry of size bytes, or measured with approximate_size() if None."""
+        if size is None:
+            size = approximate_size(key) + approximate_size(value)
+        with self._lock:
+            main_max_bytes = self.max_bytes - self.window_max_bytes
+            if size > main_max_bytes:
+                # Could never be admitted; drop any older value too
+                self.pop(key, None)
+                self.rejections += 1
+                return
+            if key in self._main:
+                # Already admitted; update in place
+                self._main_bytes += size - self._main[key][1]
+                self._main[key] = (value, size)
+                self._main.move_to_end(key)
+                self._evict_main(main_max_bytes)
+                return
+            if key in self._window:
+                self._window_bytes -= self._window.pop(key)[1]
+            self._window[key] = (value, size)
+            self._window_bytes += size
+            self._drain_window()
+
+    def setdefault(self, key, default=None):
+        with self._lock:
+            if key not in self:
+                self[key] = default
+                return default
+            return self[key]
+
+    def pop(self, key, *default):
+        with self._lock:
+            for segment in (self._window, self._main):
+                if key in segment:
+                    value, size = segment.pop(key)
+                    if segment is self._window:
+                        self._window_bytes -= size
+                    else:
+                        self._main_bytes -= size
+                    return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def _drain_window(self):
+        """
+        Move entries past the window budget to the main cache, if admitted.
+        An entry bigger than the whole window goes straight to admission.
+        """
+        main_max_bytes = self.max_bytes - self.window_max_bytes
+        while self._window_bytes > self.window_max_bytes:
+            candidate = next(iter(self._window))
+            value, size = self._window.pop(candidate)
+            self._window_bytes -= size
+            if self._admit(candidate, size, main_max_bytes):
+                self._main[candidate] = (value, size)
+                self._main_bytes += size
+            else:
+                self.rejections += 1
+
+    def _admit(self, candidate, size, main_max_bytes):
+        """
+        Make room in the main cache for the candidate, evicting LRU entries
+        that are requested less often than it. Returns False, evicting
+        nothing, if the candidate loses.
+        """
+        if size > main_max_bytes:
+            return False
+        freed = 0
+        victims = []
+        frequency = self._sketch.estimate(candidate)
+        for victim, (_, victim_size) in self._main.items():
+            if self._main_bytes - freed + size <= main_max_bytes:
+                break
+            if self._sketch.estimate(victim) >= frequency:
+                return False
+            victims.append(victim)
+            freed += victim_size
+        for victim in victims:
+            del self._main[victim]
+            self.evictions += 1
+        self._main_bytes -= freed
+        return True
+
+    def _evict_main(self, main_max_bytes):
+        while self._main_bytes > main_max_bytes and len(self._main) > 1:
+            _, (_, size) = self._main.popitem(last=False)
+            self._main_bytes -= size
+            self.evictions += 1
+
+    def keys(self):
+        with self._lock:
+            return list(self._main) + list(self._window)
+
+    def items(self):
+        with self._lock:
+            return [(key, value) for segment in (self._main, self._window) for key, (value, _) in segment.items()]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._window) + len(self._main)
+
+    def clear(self):
+        with self._lock:
+            self._window.clear()
+            self._main.clear()
+            self._window_bytes = self._main_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._window) + len(self._main),
+                "bytes": self._window_bytes + self._main_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 4) if requests else None,
+                "evictions": self.evictions,
+                "rejections": self.rejections
+            }
+
+def stats():
+    """Stats for every BoundedCache, by name."""
+    return {name: cache.stats() for name, cache in _CACHES.items()}
@@ -1,3 +1,15 @@
 bind = "0.0.0.0:8080"
 workers = 1
 timeout = 30
+
+def post_worker_init(worker):
+    # Runs in the worker before it accepts requests
+    from app import warmup
+    warmup()
+    # One worker per host evaluates subscriptions in the background
+    from subscriptions import start_evaluator
+    start_evaluator()
+
+def worker_exit(server, worker):
+    from app import save_cache_snapshot
+    save_cache_snapshot()
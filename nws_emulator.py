@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for api.weather.gov, for running the app offline and for
+repeatable performance and resilience tests of the fetch path.
+
+Serves /points, /gridpoints/.../forecast, /gridpoints/.../forecast/hourly,
+/gridpoints/... (raw layers) and /alerts/active from the fixture files in
+fixtures/nws, which cover every city in the app for a fixed week. Missing
+responses are answered with 404, recorded from api.weather.gov with
+--record, or synthesized deterministically from the coordinates with
+--synthesize. Latency, 5xx errors and 429s can be injected, either on the
+command line or at runtime through /__emulator/config.
+
+Usage:
+    python nws_emulator.py --port 8081 [--fixtures fixtures/nws] [--record | --synthesize]
+                           [--latency 250] [--jitter 50]
+                           [--error-rate 0.1] [--throttle-rate 0.05]
+    NWS_API_BASE=http://127.0.0.1:8081 python app.py
+
+The bundled fixtures were written with the synthesizer:
+    python nws_emulator.py --write-fixtures 25.7617,-80.1918 26.1224,-80.1373 ...
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+UPSTREAM = "https://api.weather.gov"
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "nws")
+
+# Cache-Control max-age sent with each kind of response, mirroring NWS
+MAX_AGE = {
+    "points": 86400,
+    "forecast": 600,
+    "gridpoint": 1800,
+    "alerts": 30
+}
+
+_POINTS = re.compile(r"^/points/(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)$")
+_GRIDPOINT = re.compile(r"^/gridpoints/(\w+)/(\d+),(\d+)(/forecast(?:/hourly)?)?$")
+
+# Synthesized data starts at this fixed local time (EDT), so it is identical on every run
+SYNTHETIC_START = datetime.datetime(2025, 6, 14, 6, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=-4)))
+
+# Forecast wording, its relative frequency, and the sky cover and precipitation
+# chance ranges (percent) the raw gridpoint layers report alongside it
+CONDITIONS = [
+    ("Sunny", 4, (0, 12), (0, 5)),
+    ("Mostly Sunny", 5, (12, 37), (0, 10)),
+    ("Partly Sunny", 3, (38, 62), (0, 15)),
+    ("Partly Cloudy", 3, (38, 62), (0, 15)),
+    ("Mostly Cloudy", 2, (63, 87), (5, 20)),
+    ("Slight Chance Rain Showers", 2, (50, 80), (15, 24)),
+    ("Chance Rain Showers", 1, (60, 90), (30, 50)),
+    ("Chance Showers And Thunderstorms", 1, (60, 95), (30, 60))
+]
+
+def fixture_name(path, query=""):
+    """Map a request path and query string to a fixture file name."""
+    name = path.strip("/").replace("/", "_")
+    if query:
+        name += "_" + query.replace("&", "_")
+    return name + ".json"
+
+def _rng(*parts):
+    """Deterministic random generator seeded from the request parameters."""
+    seed = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+    return random.Random(int(seed[:16], 16))
+
+def _period_starts(hours, count):
+    """Consecutive period boundaries starting at SYNTHETIC_START."""
+    return [SYNTHETIC_START + datetime.timedelta(hours=hours * i) for i in range(count)]
+
+def _condition(wfo, x, y, start):
+    """The condition of the 12-hour forecast period containing start, shared by all products."""
+    period = (start - SYNTHETIC_START) // datetime.timedelta(hours=12)
+    rng = _rng("condition", wfo, x, y, period)
+    return rng.choices(CONDITIONS, weights=[weight for _, weight, _, _ in CONDITIONS])[0]
+
+def synthesize_points(base_url, lat, lon):
+    rng = _rng("points", lat, lon)
+    wfo = "EMU"
+    x, y = int((float(lon) + 180) * 10) % 200, int((float(lat) + 90) * 10) % 200
+    grid_url = f"{base_url}/gridpoints/{wfo}/{x},{y}"
+    return {
+        "id": f"{base_url}/points/{lat},{lon}",
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [float(lon), float(lat)]},
+        "properties": {
+            "gridId": wfo,
+            "gridX": x,
+            "gridY": y,
+            "forecast": f"{grid_url}/forecast",
+            "forecastHourly": f"{grid_url}/forecast/hourly",
+            "forecastGridData": grid_url,
+            "forecastZone": f"{base_url}/zones/forecast/FLZ{100 + rng.randint(0, 99)}",
+            "county": f"{base_url}/zones/county/FLC{rng.randint(1, 133):03d}",
+            "relativeLocation": {"properties": {"city": "Emulated", "state": "FL"}}
+        }
+    }
+
+def synthesize_forecast(wfo, x, y, hourly=False):
+    hours = 1 if hourly else 12
+    # NWS sends 156 hourly periods; two days keep the bundled fixtures small
+    count = 48 if hourly else 14
+    periods = []
+    for number, start in enumerate(_period_starts(hours, count), 1):
+        rng = _rng("forecast", wfo, x, y, hours, start.isoformat())
+        is_daytime = 6 <= start.hour < 18
+        temperature = rng.randint(74, 92) if is_daytime else rng.randint(62, 76)
+        wind = rng.randint(3, 22)
+        condition = _condition(wfo, x, y, start)[0]
+        periods.append({
+            "number": number,
+            "name": "" if hourly else start.strftime("%A") + ("" if is_daytime else " Night"),
+            "startTime": start.isoformat(),
+            "endTime": (start + datetime.timedelta(hours=hours)).isoformat(),
+            "isDaytime": is_daytime,
+            "temperature": temperature,
+            "temperatureUnit": "F",
+            "temperatureTrend": None,
+            "windSpeed": f"{wind} mph",
+            "windDirection": rng.choice(["N", "NE", "E", "SE", "S", "SW", "W", "NW"]),
+            "icon": f"{UPSTREAM}/icons/land/{'day' if is_daytime else 'night'}/few?size=medium",
+            "shortForecast": condition,
+            "detailedForecast": "" if hourly else f"{condition}, with a high near {temperature}. Wind around {wind} mph."
+        })
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Polygon", "coordinates": [[[-80.2, 25.7], [-80.1, 25.7], [-80.1, 25.8], [-80.2, 25.8], [-80.2, 25.7]]]},
+        "properties": {
+            "units": "us",
+            "generatedAt": SYNTHETIC_START.isoformat(),
+            "updateTime": SYNTHETIC_START.isoformat(),
+            "elevation": {"unitCode": "wmoUnit:m", "value": 2},
+            "periods": periods
+        }
+    }
+
+def synthesize_gridpoint(wfo, x, y):
+    starts = _period_starts(3, 56)
+
+    def layer(name, uom, values_for):
+        values = []
+        for start in starts:
+            rng = _rng("gridpoint", name, wfo, x, y, start.isoformat())
+            values.append({"validTime": f"{start.isoformat()}/PT3H", "value": values_for(rng, start)})
+        return {"uom": uom, "values": values}
+
+    # Sky cover and precipitation chance follow the period's forecast wording
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Polygon", "coordinates": []},
+        "properties": {
+            "updateTime": SYNTHETIC_START.isoformat(),
+            "skyCover": layer("skyCover", "wmoUnit:percent",
+                              lambda rng, start: rng.randint(*_condition(wfo, x, y, start)[2])),
+            "probabilityOfPrecipitation": layer("probabilityOfPrecipitation", "wmoUnit:percent",
+                                                lambda rng, start: rng.randint(*_condition(wfo, x, y, start)[3])),
+            "windGust": layer("windGust", "wmoUnit:km_h-1", lambda rng, start: rng.randint(5, 50)),
+            "apparentTemperature": layer("apparentTemperature", "wmoUnit:degC", lambda rng, start: rng.randint(18, 38))
+        }
+    }
+
+# Alerts in effect during the synthesized week: event, severity, affected
+# zone/county ids (matching those synthesize_points assigns), and the
+# window as hours after SYNTHETIC_START
+SYNTHETIC_ALERTS = [
+    ("Rip Current Statement", "Moderate", [f"FLZ{zone}" for zone in range(100, 200, 4)], 24, 36),
+    ("Heat Advisory", "Moderate", [f"FLZ{zone}" for zone in range(101, 200, 3)], 77, 85),
+    ("Beach Hazards Statement", "Minor", [f"FLC{county:03d}" for county in range(1, 134, 5)], 120, 132)
+]
+
+def synthesize_alerts(base_url):
+    features = []
+    for number, (event, severity, zones, onset, ends) in enumerate(SYNTHETIC_ALERTS, 1):
+        onset = SYNTHETIC_START + datetime.timedelta(hours=onset)
+        ends = SYNTHETIC_START + datetime.timedelta(hours=ends)
+        alert_id = f"urn:oid:2.49.0.1.840.0.emulator.{number}"
+        features.append({
+            "id": f"{base_url}/alerts/{alert_id}",
+            "type": "Feature",
+            "properties": {
+                "id": alert_id,
+                "areaDesc": "Emulated",
+                "geocode": {"UGC": zones},
+                "affectedZones": [
+                    f"{base_url}/zones/{'county' if zone[2] == 'C' else 'forecast'}/{zone}" for zone in zones
+                ],
+                "sent": SYNTHETIC_START.isoformat(),
+                "effective": SYNTHETIC_START.isoformat(),
+                "onset": onset.isoformat(),
+                "expires": ends.isoformat(),
+                "ends": ends.isoformat(),
+                "status": "Actual",
+                "messageType": "Alert",
+                "severity": severity,
+                "event": event,
+                "headline": f"{event} issued {SYNTHETIC_START:%B %d} by NWS Emulator"
+            }
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+class EmulatorConfig:
+    """Fault injection settings, shared by all request handler threads."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=5):
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.requests = 0
+
+    def as_dict(self):
+        return {
+            "latency": self.latency,
+            "jitter": self.jitter,
+            "error_rate": self.error_rate,
+            "throttle_rate": self.throttle_rate,
+            "retry_after": self.retry_after,
+            "requests": self.requests
+        }
+
+    def update(self, values):
+        with self.lock:
+            for key in ("latency", "jitter", "error_rate", "throttle_rate", "retry_after"):
+                if key in values:
+                    setattr(self, key, type(getattr(self, key))(values[key]))
+
+class NWSEmulatorHandler(BaseHTTPRequestHandler):
+    server_version = "NWSEmulator/1.0"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, data, max_age=None, extra_headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/geo+json")
+        self.send_header("Content-Length", str(len(body)))
+        if max_age is not None:
+            self.send_header("Cache-Control", f"public, max-age={max_age}")
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _base_url(self):
+        return f"http://{self.headers.get('Host') or '%s:%s' % self.server.server_address[:2]}"
+
+    def do_GET(self):
+        parsed = urllib.parse.urlsplit(self.path)
+        if parsed.path == "/__emulator/config":
+            return self._send_json(200, self.server.config.as_dict())
+
+        config = self.server.config
+        with config.lock:
+            config.requests += 1
+            latency, jitter = config.latency, config.jitter
+            error_rate, throttle_rate, retry_after = config.error_rate, config.throttle_rate, config.retry_after
+
+        delay = latency + (self.server.rng.uniform(-jitter, jitter) if jitter else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        roll = self.server.rng.random()
+        if roll < throttle_rate:
+            return self._send_json(429, {"title": "Too Many Requests", "status": 429}, extra_headers={"Retry-After": str(retry_after)})
+        if roll < throttle_rate + error_rate:
+            return self._send_json(500, {"title": "Unexpected Problem", "status": 500})
+
+        kind, data = self._resolve(parsed)
+        if data is None:
+            return self._send_json(404, {"title": "Not Found", "status": 404})
+        self._send_json(200, data, max_age=MAX_AGE[kind])
+
+    def do_POST(self):
+        if urllib.parse.urlsplit(self.path).path != "/__emulator/config":
+            return self._send_json(404, {"title": "Not Found", "status": 404})
+        length = int(self.headers.get("Content-Length") or 0)
+        self.server.config.update(json.loads(self.rfile.read(length) or b"{}"))
+        self._send_json(200, self.server.config.as_dict())
+
+    def _resolve(self, parsed):
+        """Return (kind, payload) for a request, from fixtures or (if enabled) synthesized."""
+        path = parsed.path.rstrip("/")
+        base_url = self._base_url()
+
+        points = _POINTS.match(path)
+        gridpoint = _GRIDPOINT.match(path)
+        if points:
+            kind = "points"
+        elif gridpoint:
+            kind = "forecast" if gridpoint.group(4) else "gridpoint"
+        elif path == "/alerts/active":
+            kind = "alerts"
+        else:
+            return None, None
+
+        data = self.server.load_fixture(path, parsed.query, base_url)
+        if data is not None or not self.server.synthesize:
+            return kind, data
+
+        if points:
+            return kind, synthesize_points(base_url, *points.groups())
+        if gridpoint:
+            wfo, x, y, suffix = gridpoint.groups()
+            if suffix:
+                return kind, synthesize_forecast(wfo, x, y, hourly=suffix.endswith("hourly"))
+            return kind, synthesize_gridpoint(wfo, x, y)
+        return kind, synthesize_alerts(base_url)
+
+class NWSEmulator(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config=None, fixtures_dir=DEFAULT_FIXTURES_DIR, record=False, quiet=False, seed=0,
+                 synthesize=False):
+        super().__init__(address, NWSEmulatorHandler)
+        self.config = config or EmulatorConfig()
+        self.fixtures_dir = fixtures_dir
+        self.record = record
+        # Without synthesis, requests with no fixture get a 404
+        self.synthesize = synthesize
+        self.quiet = quiet
+        self.rng = random.Random(seed)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_error(self, request, client_address):
+        # Clients that time out on an injected delay close the connection
+        # before the response is written; that's expected, not an error
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def load_fixture(self, path, query, base_url):
+        """
+        Load a recorded response, rewriting upstream URLs to this emulator.
+        In record mode, missing fixtures are fetched from api.weather.gov first.
+        """
+        fixture_path = os.path.join(self.fixtures_dir, fixture_name(path, query))
+        if not os.path.exists(fixture_path):
+            if not self.record:
+                return None
+            self._record(path, query, fixture_path)
+        with open(fixture_path, encoding="utf-8") as f:
+            return json.loads(f.read().replace(UPSTREAM, base_url))
+
+    def _record(self, path, query, fixture_path):
+        url = UPSTREAM + path + ("?" + query if query else "")
+        headers = {
+            "User-Agent": f"SunbathingChecker/1.0 ({os.getenv('USER_EMAIL')})",
+            "Accept": "application/geo+json"
+        }
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as resp:
+            body = resp.read()
+        os.makedirs(os.path.dirname(fixture_path), exist_ok=True)
+        with open(fixture_path, "wb") as f:
+            f.write(body)
+        print(f"Recorded {url} -> {fixture_path}")
+
+def write_fixtures(coordinates, fixtures_dir=DEFAULT_FIXTURES_DIR, area="FL"):
+    """
+    Write synthesized /points, forecast, hourly forecast, gridpoint and
+    alert fixtures for [(lat, lon)], as if recorded from api.weather.gov.
+    """
+    os.makedirs(fixtures_dir, exist_ok=True)
+
+    def write(path, data, query=""):
+        with open(os.path.join(fixtures_dir, fixture_name(path, query)), "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+            f.write("\n")
+
+    for lat, lon in coordinates:
+        # Formatted the way the app builds the /points URL
+        lat, lon = repr(float(lat)), repr(float(lon))
+        point = synthesize_points(UPSTREAM, lat, lon)
+        wfo, x, y = (point["properties"][name] for name in ("gridId", "gridX", "gridY"))
+        grid_path = f"/gridpoints/{wfo}/{x},{y}"
+        write(f"/points/{lat},{lon}", point)
+        write(f"{grid_path}/forecast", synthesize_forecast(wfo, x, y))
+        write(f"{grid_path}/forecast/hourly", synthesize_forecast(wfo, x, y, hourly=True))
+        write(grid_path, synthesize_gridpoint(wfo, x, y))
+    write("/alerts/active", synthesize_alerts(UPSTREAM), query=f"area={area}")
+
+def start_emulator(port=0, host="127.0.0.1", latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, **kwargs):
+    """Start an emulator on a background thread; returns the server (call .shutdown() to stop)."""
+    config = EmulatorConfig(latency=latency, jitter=jitter, error_rate=error_rate, throttle_rate=throttle_rate)
+    server = NWSEmulator((host, port), config=config, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for api.weather.gov.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Directory of recorded responses")
+    parser.add_argument("--record", action="store_true", help="Fetch and store missing fixtures from api.weather.gov")
+    parser.add_argument("--synthesize", action="store_true", help="Synthesize responses missing from the fixtures instead of answering 404")
+    parser.add_argument("--write-fixtures", nargs="+", metavar="LAT,LON", help="Write synthesized fixtures for these coordinates and exit")
+    parser.add_argument("--latency", type=float, default=0, help="Added latency per request (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="Random +/- latency (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=5, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency jitter and fault injection")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    if args.write_fixtures:
+        write_fixtures([coordinate.split(",") for coordinate in args.write_fixtures], args.fixtures)
+        print(f"Wrote fixtures for {len(args.write_fixtures)} points to {args.fixtures}")
+        return
+
+    config = EmulatorConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after
+    )
+    server = NWSEmulator((args.host, args.port), config=config, fixtures_dir=args.fixtures,
+                         record=args.record, quiet=args.quiet, seed=args.seed, synthesize=args.synthesize)
+    print(f"NWS emulator listening on {server.base_url} (fixtures: {args.fixtures})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
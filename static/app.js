@@ -0,0 +1,114 @@
+// Loading messages to cycle through
+const loadingMessages = [
+    "Checking if the sun is feeling friendly...",
+    "Counting clouds in the sky...",
+    "Measuring the wind's enthusiasm...",
+    "Consulting with the flamingos...",
+    "Calculating optimal sunbathing angles...",
+    "Evaluating beach weather potential...",
+    "Determining flamingo rating...",
+    "Analyzing sunbathing conditions..."
+];
+
+let messageIndex = 0;
+let messageInterval;
+
+function cycleLoadingMessage() {
+    const loadingText = document.getElementById('loadingText');
+    loadingText.textContent = loadingMessages[messageIndex];
+    messageIndex = (messageIndex + 1) % loadingMessages.length;
+}
+
+function showLoading() {
+    const overlay = document.getElementById('loadingOverlay');
+    overlay.style.display = 'flex';
+    messageIndex = 0;
+    cycleLoadingMessage();
+    messageInterval = setInterval(cycleLoadingMessage, 2000);
+}
+
+function hideLoading() {
+    const overlay = document.getElementById('loadingOverlay');
+    overlay.style.display = 'none';
+    clearInterval(messageInterval);
+}
+
+// Function to handle double-click on location options
+function handleLocationDoubleClick(e) {
+    // Prevent the default double-click behavior
+    e.preventDefault();
+
+    if (e.target.tagName === 'OPTION') {
+        // Clear other selections
+        const options = e.target.parentElement.options;
+        for (let i = 0; i < options.length; i++) {
+            options[i].selected = options[i] === e.target;
+        }
+
+        // Show loading and submit form
+        showLoading();
+        document.getElementById('weatherForm').submit();
+    }
+}
+
+// Function to initialize event listeners
+function initializeEventListeners() {
+    const locationSelect = document.getElementById('location');
+    if (locationSelect) {
+        // Remove existing listener to prevent duplicates
+        locationSelect.removeEventListener('dblclick', handleLocationDoubleClick);
+        // Add the event listener
+        locationSelect.addEventListener('dblclick', handleLocationDoubleClick);
+    }
+
+    // Add submit handler to the form
+    const form = document.getElementById('weatherForm');
+    if (form) {
+        form.addEventListener('submit', function(e) {
+            showLoading();
+        });
+    }
+}
+
+// Initialize on page load
+initializeEventListeners();
+
+// Initialize after form submission (in case of partial page updates)
+document.addEventListener('DOMContentLoaded', initializeEventListeners);
+
+// Compact results: fetch the detailed forecast text when a day is expanded
+let forecastRequest = null;
+
+function loadDetailedForecast(details) {
+    const text = details.querySelector('p');
+    if (text.textContent) {
+        return;
+    }
+    if (!forecastRequest) {
+        const params = new URLSearchParams(window.location.search);
+        params.delete('compact');
+        forecastRequest = fetch('/api/forecast?' + params.toString()).then(function(response) {
+            return response.json();
+        });
+    }
+    text.textContent = 'Loading...';
+    forecastRequest.then(function(data) {
+        const location = (data.locations || []).find(function(item) {
+            return item.name === details.dataset.location;
+        });
+        const day = location && location.days.find(function(item) {
+            return item.date === details.dataset.date;
+        });
+        text.textContent = day ? day.detailedForecast : 'No detailed forecast available.';
+    }).catch(function() {
+        forecastRequest = null;
+        text.textContent = 'Could not load the detailed forecast.';
+    });
+}
+
+// toggle doesn't bubble, so listen in the capture phase
+document.addEventListener('toggle', function(e) {
+    if (e.target.classList && e.target.classList.contains('forecast-details') && e.target.open) {
+        loadDetailedForecast(e.target);
+    }
+}, true);
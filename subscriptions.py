@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Subscriptions: notify users when a location reaches their flamingo rating.
+
+Users register a location, criteria and minimum flamingo rating. The
+evaluator groups subscriptions by location and criteria, so each forecast is
+loaded once and each distinct criteria set is scored once, and only
+subscriptions whose outcome (the dates meeting their rating) changed get a
+notification. Notifications go to a pluggable sink: the outbox table
+(default, for another process to pick up) or a webhook. Each subscription
+gets a token, which is needed to unsubscribe.
+
+The database is a local SQLite file, so the evaluator runs inside the web
+app (start_evaluator, from the gunicorn worker hook): one worker per host
+takes a lock on the database and evaluates in a background thread. Every
+instance of the app needs the same SUBSCRIPTIONS_DB, so run a single
+instance with the file on a persistent disk.
+
+Usage:
+    python subscriptions.py add "Miami, FL" --min-rating 4 [--webhook URL]
+    python subscriptions.py remove ID
+    python subscriptions.py evaluate [--interval 900]
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import secrets
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+import app
+
+SUBSCRIPTIONS_DB = os.getenv("SUBSCRIPTIONS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "subscriptions.db"))
+
+# Seconds between runs of the in-process evaluator; 0 turns it off
+SUBSCRIPTIONS_INTERVAL = int(os.getenv("SUBSCRIPTIONS_INTERVAL", "900"))
+
+CRITERIA_FIELDS = ("min_temp", "max_temp", "max_wind", "required_condition")
+
+# Per client (see app.client_address): subscriptions created per hour, and
+# subscriptions held at once
+SUBSCRIBE_RATE_LIMIT = int(os.getenv("SUBSCRIBE_RATE_LIMIT", "10"))
+SUBSCRIBE_MAX_PER_CLIENT = int(os.getenv("SUBSCRIBE_MAX_PER_CLIENT", "50"))
+
+class SubscriptionLimitExceeded(Exception):
+    pass
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    id INTEGER PRIMARY KEY,
+    location TEXT NOT NULL,
+    min_temp INTEGER NOT NULL,
+    max_temp INTEGER NOT NULL,
+    max_wind INTEGER NOT NULL,
+    required_condition TEXT NOT NULL,
+    min_rating INTEGER NOT NULL,
+    sink TEXT NOT NULL DEFAULT 'outbox',
+    target TEXT,
+    token TEXT,
+    client TEXT,
+    group_key TEXT NOT NULL,
+    last_outcome TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS subscriptions_group ON subscriptions (group_key);
+CREATE INDEX IF NOT EXISTS subscriptions_client ON subscriptions (client, created_at);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    subscription_id INTEGER NOT NULL,
+    sink TEXT NOT NULL,
+    target TEXT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    delivered_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (sink, delivered_at);
+"""
+
+def connect(path=None):
+    db = sqlite3.connect(path or SUBSCRIPTIONS_DB)
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    return db
+
+def group_key(location, criteria, min_rating):
+    """Subscriptions with the same key always share an outcome."""
+    return json.dumps([location] + [criteria[field] for field in CRITERIA_FIELDS] + [min_rating])
+
+def validate_webhook(url):
+    """
+    Raise ValueError unless url is https and its host resolves only to public
+    addresses, so a subscriber can't point deliveries at localhost, cloud
+    metadata or internal services. Checked again before every delivery, in
+    case the host's DNS changed.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "https" or not parts.hostname:
+        raise ValueError("Webhook must be an https URL")
+    if parts.username or parts.password:
+        raise ValueError("Webhook URL must not contain credentials")
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or 443, proto=socket.IPPROTO_TCP)
+    except (OSError, UnicodeError) as e:
+        raise ValueError(f"Could not resolve webhook host {parts.hostname}") from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"Webhook host {parts.hostname} is not a public address")
+
+def check_client_limits(db, client, count=1):
+    """Raise SubscriptionLimitExceeded if client can't add count more subscriptions now."""
+    held, recent = db.execute(
+        "SELECT COUNT(*), COUNT(CASE WHEN created_at > ? THEN 1 END) FROM subscriptions WHERE client = ?",
+        (time.time() - 3600, client)
+    ).fetchone()
+    if recent + count > SUBSCRIBE_RATE_LIMIT:
+        raise SubscriptionLimitExceeded("Too many subscriptions this hour; try again later.")
+    if held + count > SUBSCRIBE_MAX_PER_CLIENT:
+        raise SubscriptionLimitExceeded("Too many subscriptions; unsubscribe from some first.")
+
+def add_subscription(db, location, criteria, min_rating, sink="outbox", target=None, client=None):
+    """Register a subscription and return (id, token); the token is needed to remove it."""
+    if location not in app.CITY_COORDINATES:
+        raise ValueError(f"Unknown location: {location}")
+    if criteria["required_condition"] not in app.GRIDPOINT_LAYERS_BY_CONDITION:
+        raise ValueError(f"Unknown condition: {criteria['required_condition']}")
+    if sink not in SINKS:
+        raise ValueError(f"Unknown sink: {sink}")
+    if sink == "webhook":
+        validate_webhook(target)
+    if not 1 <= min_rating <= 5:
+        raise ValueError("min_rating must be between 1 and 5")
+    token = secrets.token_urlsafe(16)
+    with db:
+        cursor = db.execute(
+            "INSERT INTO subscriptions (location, min_temp, max_temp, max_wind, required_condition,"
+            " min_rating, sink, target, token, client, group_key, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (location, *(criteria[field] for field in CRITERIA_FIELDS), min_rating, sink, target, token, client,
+             group_key(location, criteria, min_rating), time.time())
+        )
+    return cursor.lastrowid, token
+
+def remove_subscription(db, subscription_id, token=None):
+    """Remove a subscription, only if token matches unless it's None; returns whether one was removed."""
+    query = "DELETE FROM subscriptions WHERE id = ?"
+    params = [subscription_id]
+    if token is not None:
+        query += " AND token = ?"
+        params.append(token)
+    with db:
+        return db.execute(query, params).rowcount > 0
+
+def evaluate_subscriptions(db, priority="background"):
+    """
+    Score every subscription group against fresh forecasts and queue
+    notifications for subscriptions whose outcome changed. Returns the number
+    of notifications queued.
+    """
+    groups = db.execute(
+        "SELECT group_key, location, min_temp, max_temp, max_wind, required_condition, min_rating"
+        " FROM subscriptions GROUP BY group_key ORDER BY location"
+    ).fetchall()
+
+    # Score each distinct (location, criteria) once, shared by all ratings
+    scored = {}
+    queued = 0
+    for group in groups:
+        criteria = {field: group[field] for field in CRITERIA_FIELDS}
+        score_key = (group["location"], tuple(criteria.values()))
+        if score_key not in scored:
+            try:
+                inputs = app.load_location(group["location"], criteria, priority)
+            except requests.RequestException as e:
+                print(f"Skipping {group['location']}: {e}")
+                scored[score_key] = None
+                continue
+            scored[score_key] = app.evaluate_location(inputs, criteria)
+        location_results = scored[score_key]
+        if location_results is None or location_results.get("stale_minutes") is not None:
+            # Don't notify from a forecast we know is out of date
+            continue
+
+        days = [
+            {"date": day["date"], "flamingo_rating": day["flamingo_rating"], "reason": day["reason"]}
+            for day in location_results["days"]
+            if day["flamingo_rating"] >= group["min_rating"]
+        ]
+        outcome = json.dumps([day["date"] for day in days])
+        queued += _record_outcome(db, group, criteria, outcome, days)
+    return queued
+
+def _record_outcome(db, group, criteria, outcome, days):
+    """Queue notifications for the group's changed subscriptions and store the new outcome."""
+    payload = json.dumps({
+        "location": group["location"],
+        "criteria": criteria,
+        "min_rating": group["min_rating"],
+        "days": days
+    })
+    changed = "group_key = ? AND (last_outcome IS NULL OR last_outcome != ?)"
+    with db:
+        queued = 0
+        if days:
+            # Only notify when there is something to go sunbathing for
+            queued = db.execute(
+                "INSERT INTO outbox (subscription_id, sink, target, payload, created_at)"
+                f" SELECT id, sink, target, ?, ? FROM subscriptions WHERE {changed}",
+                (payload, time.time(), group["group_key"], outcome)
+            ).rowcount
+        db.execute(f"UPDATE subscriptions SET last_outcome = ? WHERE {changed}", (outcome, group["group_key"], outcome))
+    return queued
+
+def deliver_outbox_row(row):
+    """The outbox sink: rows stay in the table for another process to consume."""
+    return False
+
+def deliver_webhook(row):
+    """POST the notification payload, with the subscription id, as JSON to the subscription's URL."""
+    validate_webhook(row["target"])
+    payload = dict(json.loads(row["payload"]), subscription_id=row["subscription_id"])
+    resp = requests.post(row["target"], json=payload, timeout=10, allow_redirects=False)
+    resp.raise_for_status()
+    return True
+
+# Notification sinks by name: deliver(row) returns True once delivered, False
+# to leave the row pending in the outbox
+SINKS = {
+    "outbox": deliver_outbox_row,
+    "webhook": deliver_webhook
+}
+
+def register_sink(name, deliver):
+    SINKS[name] = deliver
+
+def deliver_pending(db, batch_size=500):
+    """Hand pending outbox rows to their sinks; returns the number delivered."""
+    delivered = 0
+    for sink, deliver in SINKS.items():
+        if deliver is deliver_outbox_row:
+            continue
+        rows = db.execute(
+            "SELECT * FROM outbox WHERE sink = ? AND delivered_at IS NULL ORDER BY id LIMIT ?",
+            (sink, batch_size)
+        ).fetchall()
+        for row in rows:
+            try:
+                if not deliver(row):
+                    continue
+            except requests.RequestException as e:
+                print(f"Could not deliver notification {row['id']} via {sink}: {e}")
+                continue
+            except ValueError as e:
+                # Will never be deliverable (e.g. the webhook host went private)
+                print(f"Dropping notification {row['id']} via {sink}: {e}")
+                with db:
+                    db.execute("DELETE FROM outbox WHERE id = ?", (row["id"],))
+                continue
+            with db:
+                db.execute("UPDATE outbox SET delivered_at = ? WHERE id = ?", (time.time(), row["id"]))
+            delivered += 1
+    return delivered
+
+def run_evaluator(db, interval=None):
+    """Evaluate and deliver once, or every interval seconds."""
+    while True:
+        start = time.monotonic()
+        queued = evaluate_subscriptions(db)
+        delivered = deliver_pending(db)
+        print(f"Evaluated subscriptions in {time.monotonic() - start:.1f}s: {queued} queued, {delivered} delivered")
+        if not interval:
+            return
+        time.sleep(max(0, interval - (time.monotonic() - start)))
+
+# Held open while this process runs the evaluator
+_evaluator_lock = None
+
+def start_evaluator(interval=None):
+    """
+    Run the evaluator every interval seconds (default SUBSCRIPTIONS_INTERVAL)
+    in a daemon thread, unless another process on the host already does.
+    Returns whether this process runs it.
+    """
+    global _evaluator_lock
+    interval = SUBSCRIPTIONS_INTERVAL if interval is None else interval
+    if not interval or _evaluator_lock is not None:
+        return False
+    lock = open(SUBSCRIPTIONS_DB + ".lock", "w")
+    if app.fcntl is not None:
+        try:
+            app.fcntl.flock(lock, app.fcntl.LOCK_EX | app.fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+    _evaluator_lock = lock
+    threading.Thread(target=_evaluate_forever, args=(interval,), name="subscriptions", daemon=True).start()
+    return True
+
+def _evaluate_forever(interval):
+    db = connect()  # SQLite connections stay on the thread that opened them
+    while True:
+        try:
+            run_evaluator(db, interval)
+        except Exception as e:
+            # Keep the thread alive; the next run may succeed
+            print(f"Subscription evaluator failed: {e}")
+            time.sleep(interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Flamingo rating subscriptions.")
+    parser.add_argument("--db", default=SUBSCRIPTIONS_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Register a subscription")
+    add.add_argument("location")
+    add.add_argument("--min-rating", type=int, default=5)
+    for field in ("min_temp", "max_temp", "max_wind"):
+        add.add_argument(f"--{field.replace('_', '-')}", type=int, default=app.DEFAULT_SUNBATHING_CRITERIA[field])
+    add.add_argument("--required-condition", default=app.DEFAULT_SUNBATHING_CRITERIA["required_condition"],
+                     choices=sorted(app.GRIDPOINT_LAYERS_BY_CONDITION))
+    add.add_argument("--webhook", help="Deliver to this URL instead of the outbox table")
+
+    remove = commands.add_parser("remove", help="Remove a subscription")
+    remove.add_argument("id", type=int)
+
+    evaluate = commands.add_parser("evaluate", help="Run the evaluator")
+    evaluate.add_argument("--interval", type=int, help="Repeat every N seconds")
+
+    args = parser.parse_args()
+    db = connect(args.db)
+    if args.command == "add":
+        criteria = {field: getattr(args, field) for field in CRITERIA_FIELDS}
+        sink, target = ("webhook", args.webhook) if args.webhook else ("outbox", None)
+        subscription_id, token = add_subscription(db, args.location, criteria, args.min_rating, sink, target)
+        print(subscription_id, token)
+    elif args.command == "remove":
+        if not remove_subscription(db, args.id):
+            sys.exit(f"No subscription {args.id}")
+    else:
+        run_evaluator(db, args.interval)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# Tests import the app's modules from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import nws_emulator  # noqa: E402
+
+def clear_caches():
+    for cache in (app._POINTS_CACHE, app._FORECAST_CACHE, app._GRIDPOINT_CACHE, app._ALERT_CACHE, app._EVALUATION_CACHE):
+        cache.clear()
+
+@pytest.fixture
+def nws_fixtures(tmp_path, monkeypatch):
+    """Point the app at an emulator serving a copy of the NWS fixtures; yields the copy's directory."""
+    fixtures_dir = tmp_path / "nws"
+    shutil.copytree(nws_emulator.DEFAULT_FIXTURES_DIR, fixtures_dir)
+    server = nws_emulator.start_emulator(fixtures_dir=str(fixtures_dir), quiet=True)
+    monkeypatch.setattr(app, "NWS_API_BASE", server.base_url)
+    monkeypatch.setattr(app, "NWS_RATE_LIMIT_FILE", str(tmp_path / "bucket"))
+    clear_caches()
+    yield fixtures_dir
+    server.shutdown()
+    clear_caches()
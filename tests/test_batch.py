@@ -0,0 +1,28 @@
+"""An interrupted batch run can be resumed into the same JSONL file."""
+
+import json
+
+from batch import JSONLWriter
+
+def test_resume_drops_partial_last_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text('{"key": "a"}\n{"key": "b"}\n{"key": "c", "da')
+    writer = JSONLWriter(str(path))
+    assert writer.done_keys() == {"a", "b"}
+    with writer:
+        writer.write([{"key": "c"}])
+    assert [json.loads(line)["key"] for line in path.read_text().splitlines()] == ["a", "b", "c"]
+
+def test_resume_without_any_complete_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text('{"key": "a", "da')
+    with JSONLWriter(str(path)) as writer:
+        writer.write([{"key": "a"}])
+    assert path.read_text() == '{"key": "a"}\n'
+
+def test_complete_file_is_kept(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text('{"key": "a"}\n')
+    with JSONLWriter(str(path)) as writer:
+        writer.write([{"key": "b"}])
+    assert path.read_text() == '{"key": "a"}\n{"key": "b"}\n'
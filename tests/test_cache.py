@@ -0,0 +1,72 @@
+"""BoundedCache admission and byte-budget eviction."""
+
+from cache import BoundedCache, approximate_size
+
+# With 50-byte entries, the window (1% of the budget) holds 2 and the main
+# cache 198
+MAX_BYTES = 10000
+SIZE = 50
+
+def fill(cache, keys, gets=0):
+    for key in keys:
+        cache.set(key, key, size=SIZE)
+        for _ in range(gets):
+            cache.get(key)
+
+def test_stays_within_byte_budget():
+    cache = BoundedCache("test-budget", MAX_BYTES)
+    for key in range(500):
+        cache.set(key, key, size=SIZE)
+        assert cache.stats()["bytes"] <= MAX_BYTES
+    stats = cache.stats()
+    assert stats["entries"] == MAX_BYTES // SIZE
+    assert stats["evictions"] + stats["rejections"] == 500 - MAX_BYTES // SIZE
+
+def test_measures_size_when_not_given():
+    cache = BoundedCache("test-measure", MAX_BYTES)
+    cache["key"] = "x" * 50
+    assert cache.stats()["bytes"] == approximate_size("key") + approximate_size("x" * 50)
+
+def test_update_replaces_size():
+    cache = BoundedCache("test-update", MAX_BYTES)
+    fill(cache, range(10))
+    cache.set(0, "bigger", size=300)
+    assert cache.stats()["bytes"] == 9 * SIZE + 300
+    assert cache[0] == "bigger"
+
+def test_rejects_entries_that_cannot_fit():
+    cache = BoundedCache("test-oversized", MAX_BYTES)
+    cache.set("huge", "old", size=SIZE)
+    cache.set("huge", "new", size=MAX_BYTES)
+    assert "huge" not in cache
+    assert cache.stats()["rejections"] == 1
+
+def test_popular_entries_survive_a_scan():
+    cache = BoundedCache("test-scan", MAX_BYTES)
+    fill(cache, range(200), gets=3)
+    # A burst of one-off keys, each requested once (a miss), then stored
+    for key in range(1000, 1400):
+        cache.get(key)
+        cache.set(key, key, size=SIZE)
+    assert sum(key in cache for key in range(200)) >= 198
+    assert cache.stats()["rejections"] >= 390
+
+def test_admits_a_key_requested_more_than_the_victim():
+    cache = BoundedCache("test-admit", MAX_BYTES)
+    fill(cache, range(200))
+    for _ in range(5):
+        cache.get("new")
+    cache.set("new", "value", size=SIZE)
+    # Pushed out of the window by later stores, and admitted over the LRU entry
+    fill(cache, ("next", "last"))
+    assert "new" in cache
+    assert 0 not in cache
+    assert cache.stats()["bytes"] <= MAX_BYTES
+
+def test_entry_bigger_than_window_goes_to_admission():
+    cache = BoundedCache("test-big", MAX_BYTES)
+    fill(cache, range(200))
+    cache.get("big")
+    cache.set("big", "value", size=10 * SIZE)
+    assert "big" in cache
+    assert cache.stats()["bytes"] <= MAX_BYTES
@@ -0,0 +1,53 @@
+"""A 304 must carry the same ETag as the 200 it stands in for."""
+
+import os
+import time
+
+import pytest
+
+import app
+
+@pytest.mark.parametrize("accept_encoding", ["gzip", "identity"])
+def test_not_modified_keeps_encoding_suffix(accept_encoding):
+    client = app.app.test_client()
+    headers = {"Accept-Encoding": accept_encoding}
+    page = client.get("/", headers=headers)
+    assert page.status_code == 200
+    etag = page.headers["ETag"]
+    assert etag.endswith('-gzip"') == (accept_encoding == "gzip")
+    assert (page.headers.get("Content-Encoding") == "gzip") == (accept_encoding == "gzip")
+
+    revalidated = client.get("/", headers=dict(headers, **{"If-None-Match": etag}))
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+
+QUERY = app.canonical_query(["Miami, FL"], app.DEFAULT_SUNBATHING_CRITERIA)
+
+@pytest.mark.parametrize("path", ["/", "/api/forecast"])
+def test_head_gets_the_same_cache_headers(nws_fixtures, path):
+    client = app.app.test_client()
+    page = client.get(f"{path}?{QUERY}")
+    head = client.head(f"{path}?{QUERY}")
+    assert head.status_code == 200
+    for name in ("ETag", "Cache-Control", "Cache-Tag"):
+        assert head.headers[name] == page.headers[name]
+
+def test_head_redirects_to_the_canonical_query(nws_fixtures):
+    response = app.app.test_client().head("/?location=Miami%2C+FL")
+    assert response.status_code == 302
+    assert response.headers["Location"] == f"/?{QUERY}"
+
+def test_stale_page_etag_follows_its_age(nws_fixtures):
+    client = app.app.test_client()
+    client.get(f"/?{QUERY}")
+    forecast_url = app.get_point_metadata(*app.CITY_COORDINATES["Miami, FL"])["forecast"]
+    os.remove(os.path.join(nws_fixtures, "gridpoints_EMU_198,157_forecast.json"))
+
+    etags = []
+    for age in (10, 30):
+        entry = app._FORECAST_CACHE[forecast_url]
+        entry["fetched_at"] = entry["expires_at"] = time.time() - age * 60
+        page = client.get(f"/?{QUERY}")
+        assert f"{age} minutes ago" in page.get_data(as_text=True)
+        etags.append(page.headers["ETag"])
+    assert etags[0] != etags[1]
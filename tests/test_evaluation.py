@@ -0,0 +1,82 @@
+"""Incremental evaluation must match evaluating from scratch."""
+
+import copy
+
+import pytest
+
+import app
+
+CRITERIA = [
+    dict(app.DEFAULT_SUNBATHING_CRITERIA, required_condition=condition)
+    for condition in sorted(app.GRIDPOINT_LAYERS_BY_CONDITION)
+]
+
+def daytime_periods(inputs):
+    return [period for period in inputs["forecast"]["data"]["properties"]["periods"] if period["isDaytime"]]
+
+def edit_period(inputs):
+    forecast = dict(inputs["forecast"], data=copy.deepcopy(inputs["forecast"]["data"]))
+    updated = dict(inputs, forecast=forecast, version=inputs["version"] + "|edited")
+    daytime_periods(updated)[2]["temperature"] += 9
+    return updated
+
+def add_alert(inputs):
+    period = daytime_periods(inputs)[1]
+    alert = {
+        "id": "test-alert",
+        "event": "Heat Advisory",
+        "severity": "Moderate",
+        "headline": "Heat Advisory",
+        "onset": period["startTime"],
+        "ends": period["endTime"]
+    }
+    return dict(inputs, alerts=inputs["alerts"] + [alert], version=inputs["version"] + "|alert")
+
+def change_gridpoints(inputs):
+    layers = {}
+    for name, layer in inputs["gridpoint_layers"].items():
+        data = layer.to_dict()
+        data["values"] = [min(100, value + 50) for value in data["values"]]
+        layers[name] = app.GridpointLayer.from_dict(data)
+    return dict(inputs, gridpoint_layers=layers, gridpoint_fetched_at=(inputs["gridpoint_fetched_at"] or 0) + 1,
+                version=inputs["version"] + "|gridpoints")
+
+@pytest.mark.parametrize("criteria", CRITERIA, ids=lambda criteria: criteria["required_condition"])
+@pytest.mark.parametrize("change", [edit_period, add_alert, change_gridpoints])
+def test_incremental_matches_cold(nws_fixtures, criteria, change):
+    inputs = app.load_location("Miami, FL", criteria)
+    before = app.evaluate_location(inputs, criteria)
+    updated = change(inputs)
+
+    incremental = app.evaluate_location(updated, criteria)
+    app._EVALUATION_CACHE.clear()
+    cold = app.evaluate_location(updated, criteria)
+    assert incremental == cold
+    assert incremental["days"] != before["days"]
+
+def test_rescores_only_the_edited_day(nws_fixtures):
+    criteria = app.DEFAULT_SUNBATHING_CRITERIA
+    inputs = app.load_location("Miami, FL", criteria)
+    app.evaluate_location(inputs, criteria)
+    before = app.evaluation_cache_state()
+    app.evaluate_location(edit_period(inputs), criteria)
+    after = app.evaluation_cache_state()
+    assert after["days_rescored"] - before["days_rescored"] == 1
+    assert after["days_reused"] - before["days_reused"] == len(daytime_periods(inputs)) - 1
+
+def test_gridpoint_layer_summarizes_only_overlapping_intervals():
+    # Out of order on purpose: the layer sorts its intervals
+    layer = app.GridpointLayer("wmoUnit:percent", [
+        {"validTime": "2024-06-01T06:00:00+00:00/PT6H", "value": 40},
+        {"validTime": "2024-06-01T00:00:00+00:00/PT6H", "value": 10},
+        {"validTime": "2024-06-01T12:00:00+00:00/PT3H", "value": None},
+        {"validTime": "2024-06-01T15:00:00+00:00/PT9H", "value": 70},
+    ])
+    day = int(app._parse_time("2024-06-01T00:00:00+00:00").timestamp())
+    hour = 3600
+    assert layer.mean(day + 3 * hour, day + 9 * hour) == 25
+    assert layer.max(day + 3 * hour, day + 9 * hour) == 40
+    assert layer.max(day + 12 * hour, day + 15 * hour) is None
+    assert layer.mean(day + 14 * hour, day + 16 * hour) == 70
+    assert layer.mean(day + 24 * hour, day + 30 * hour) is None
+    assert layer.max(day - 6 * hour, day) is None
@@ -0,0 +1,46 @@
+"""An NWS response of the wrong shape is an upstream failure, not a crash."""
+
+import json
+import os
+import time
+
+import app
+
+MIAMI_FORECAST = "gridpoints_EMU_198,157_forecast.json"
+QUERY = app.canonical_query(["Miami, FL", "Naples, FL"], app.DEFAULT_SUNBATHING_CRITERIA)
+
+def break_forecast(fixtures_dir):
+    path = os.path.join(fixtures_dir, MIAMI_FORECAST)
+    with open(path, encoding="utf-8") as f:
+        forecast = json.load(f)
+    forecast["properties"]["periods"][0]["temperature"] = {"value": 80}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(forecast, f)
+
+def test_api_skips_only_the_broken_location(nws_fixtures):
+    break_forecast(nws_fixtures)
+    response = app.app.test_client().get(f"/api/forecast?{QUERY}")
+    assert response.status_code == 200
+    miami, naples = response.get_json()["locations"]
+    assert miami["unavailable"]
+    assert naples["days"]
+
+def test_page_keeps_the_healthy_location(nws_fixtures):
+    break_forecast(nws_fixtures)
+    response = app.app.test_client().get(f"/?{QUERY}")
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert "Please enter valid numbers" not in page
+    assert "Evaluation for Naples, FL" in page
+    assert "Evaluation for Miami, FL" in page  # With the unavailable banner
+
+def test_serves_stale_forecast(nws_fixtures):
+    client = app.app.test_client()
+    client.get(f"/api/forecast?{QUERY}")
+    for entry in app._FORECAST_CACHE.values():
+        entry["expires_at"] = time.time() - 1
+    break_forecast(nws_fixtures)
+    miami, naples = client.get(f"/api/forecast?{QUERY}").get_json()["locations"]
+    assert miami["days"]
+    assert miami["stale_minutes"] is not None
+    assert naples["stale_minutes"] is None
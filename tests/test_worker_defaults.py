@@ -0,0 +1,23 @@
+"""_worker.js builds edge cache keys with a hand-copied set of criteria defaults."""
+
+import os
+import re
+
+import app
+
+def worker_criteria_defaults():
+    with open(os.path.join(os.path.dirname(os.path.abspath(app.__file__)), "_worker.js"), encoding="utf-8") as f:
+        source = f.read()
+    block = re.search(r"const CRITERIA_DEFAULTS = \[(.*?)\];", source, re.S).group(1)
+    return re.findall(r'\["(\w+)", "([^"]*)"\]', block)
+
+def test_worker_defaults_match_app():
+    expected = [(name, str(app.DEFAULT_SUNBATHING_CRITERIA[name]))
+                for name in ("min_temp", "max_temp", "max_wind", "required_condition")]
+    assert worker_criteria_defaults() == expected
+
+def test_worker_key_order_matches_canonical_query():
+    # The worker's key must be byte-identical to the origin's canonical query
+    names = [name for name, _ in worker_criteria_defaults()]
+    query = app.canonical_query([], app.DEFAULT_SUNBATHING_CRITERIA)
+    assert [pair.split("=")[0] for pair in query.split("&")] == names